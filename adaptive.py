@@ -0,0 +1,67 @@
+# Adaptive cutoff: a QUEST-style Bayesian estimate of the reaction limit
+#
+# Instead of judging every low against a fixed LOW_REQUIRED_FRAME, each low
+#   gets the cutoff frame the posterior currently thinks you block 75% of the
+#   time, so trials are spent where they say the most about your limit.
+#
+# Model: P(low blocked by cutoff frame d) = (1 - lapse) * logistic((d - t)/s
+#   + logit(q)), with q = 0.75 / (1 - lapse), which makes t exactly the 75%
+#   frame. The posterior over (t, s) lives on a fixed grid in log space and
+#   each outcome is one vectorized update (~tens of us).
+
+import numpy as np
+
+TARGET = 0.75
+LAPSE = 0.02            # chance of missing a low you'd normally block
+FRAME_STEP = 0.25       # threshold grid resolution (frames)
+SLOPES = np.geomspace(0.5, 8.0, 16) # psychometric spread (frames)
+
+
+class QuestThreshold:
+    def __init__(self, min_frame: float, max_frame: float,
+                 target: float = TARGET, lapse: float = LAPSE):
+        self.lapse = lapse
+        self.thresholds = np.arange(min_frame, max_frame + FRAME_STEP / 2, FRAME_STEP)
+        # (thresholds, slopes) grids; flat prior
+        self._t = self.thresholds[:, None]
+        self._s = SLOPES[None, :]
+        q = target / (1 - lapse)
+        self._offset = np.log(q / (1 - q))
+        self.log_post = np.zeros((len(self.thresholds), len(SLOPES)))
+        self.trials = 0
+
+    def p_blocked(self, frame: float):
+        # P(blocked in time) at cutoff `frame`, over the whole grid
+        z = (frame - self._t) / self._s + self._offset
+        return (1 - self.lapse) / (1 + np.exp(-z))
+
+    def update(self, frame: float, blocked: bool):
+        p = self.p_blocked(frame)
+        self.log_post += np.log(p if blocked else 1 - p)
+        self.log_post -= self.log_post.max()
+        self.trials += 1
+
+    def replay(self, trials):
+        # Rebuild the posterior from earlier (cutoff frame, blocked) outcomes,
+        #   e.g. the lows of a recovered session
+        for frame, blocked in trials:
+            self.update(frame, blocked)
+
+    def marginal(self):
+        # Posterior over the threshold frame (summed over slopes)
+        weights = np.exp(self.log_post).sum(axis=1)
+        return weights / weights.sum()
+
+    def next_frame(self) -> float:
+        # Test at the posterior mean (QUEST placement)
+        return float(self.marginal() @ self.thresholds)
+
+    def estimate(self, credible: float = 0.95):
+        # Returns: (mean threshold frame, lower, upper) with `credible` mass between
+        marginal = self.marginal()
+        cdf = np.cumsum(marginal)
+        tail = (1 - credible) / 2
+        lo, hi = np.searchsorted(cdf, [tail, 1 - tail])
+        hi = min(hi, len(self.thresholds) - 1)
+        return (float(marginal @ self.thresholds),
+                float(self.thresholds[lo]), float(self.thresholds[hi]))
@@ -0,0 +1,290 @@
+# Progress across sessions, from the log/ directory
+#
+# All session logs are consolidated into one columnar index (log/.index/
+#   trials.npz: session id, event code, RT, pressed frame, clip, cutoff frame
+#   per trial) plus a manifest of each log's mtime/size and significance
+#   null (the app's: Scenario.chance_rate of the session's clips, as last
+#   set in it; 50% for logs from before scenarios). A run only parses
+#   logs that are new or changed since the last run (in a process pool when
+#   there are many), so summarizing months of sessions costs one npz load
+#   and a few NumPy reductions.
+#
+# Usage: python analytics.py [log_dir] [--last N] [--rebuild]
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scenario import Clip, Scenario
+from session_file import read_header, read_session, store_from_records
+from significance import binom_two_sided_p
+from trial_log import CONFIG_SUFFIX
+from trial_store import TrialStore, EVENTS, EVENT_CODES, EVENT_INFO
+
+INDEX_DIR = ".index"
+INDEX_FILE = "trials.npz"
+MANIFEST_FILE = "manifest.json"
+PARALLEL_MIN_FILES = 8  # below this, parsing in-process is faster
+
+CORRECT_CODES = [EVENT_CODES[e] for e in EVENTS if EVENT_INFO[e][0]]
+LOW_CODES = [EVENT_CODES[e] for e in EVENTS if EVENT_INFO[e][1] == 'low']
+LOW_PRESS_CODES = [EVENT_CODES['low_block'], EVENT_CODES['low_block_late']]
+
+
+def session_start(filename: str):
+    # "guesses_2025-05-03 12;02 AM.csv" -> datetime (None if it doesn't parse)
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    stem = stem.split(" (")[0] # "... (1)" from finalized duplicate names
+    try:
+        return datetime.datetime.strptime(stem[len("guesses_"):], "%Y-%m-%d %I;%M %p")
+    except ValueError:
+        return None
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def session_chance(filename: str) -> float:
+    # The significance null the app used for a session: its scenario's
+    #   chance rate, from the config (the .t7s header or the sidecar) and
+    #   any scenario a config profile switched to later
+    config = {}
+    if filename.endswith(".t7s"):
+        with open(filename, "rb") as f:
+            try:
+                config = read_header(f)[0].get('config') or {}
+            except (ValueError, struct.error):
+                pass
+    if 'converted_from' in config: # the original CSV's sidecar
+        filename = os.path.join(os.path.dirname(filename), config['converted_from'])
+    sidecar = _read_json(filename + CONFIG_SUFFIX)
+    clips = config.get('clips') or sidecar.get('clips')
+    for change in sidecar.get('changes', []):
+        clips = change.get('clips', clips)
+    if not clips:
+        return 0.50 # a random mid/low pair
+    try:
+        return Scenario([Clip(**clip) for clip in clips]).chance_rate()
+    except (TypeError, ValueError):
+        return 0.50
+
+def _parse_log(filename: str):
+    # Runs in worker processes: returns raw column bytes and the null
+    if filename.endswith(".t7s"):
+        store = store_from_records(read_session(filename)[1])
+    else:
+        with open(filename, "r", encoding="utf-8") as f:
+            store = TrialStore.read_csv(f)
+    return (store.events.tobytes(), store.rts.tobytes(), store.frames.tobytes(),
+            store.clips.tobytes(), store.cutoffs.tobytes(), session_chance(filename))
+
+
+class LogIndex:
+    def __init__(self, log_dir: str = "log"):
+        self.log_dir = log_dir
+        self.index_dir = os.path.join(log_dir, INDEX_DIR)
+        self.manifest = {}      # filename -> {'mtime', 'size', 'session', 'chance'}
+        self.session = np.zeros(0, dtype=np.int32)
+        self.event = np.zeros(0, dtype=np.uint8)
+        self.rt = np.zeros(0, dtype=np.float64)
+        self.frame = np.zeros(0, dtype=np.int32)
+        self.clip = np.zeros(0, dtype=np.int16)  # -1 = not recorded
+        self.cutoff = np.zeros(0, dtype=np.float32) # NaN = none / not recorded
+
+    def load(self):
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE)
+        index_path = os.path.join(self.index_dir, INDEX_FILE)
+        if not (os.path.exists(manifest_path) and os.path.exists(index_path)):
+            return self
+        with np.load(index_path) as data:
+            if 'cutoff' not in data:
+                return self # index from before the clip/cutoff columns: rebuild it
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if any('chance' not in entry for entry in manifest.values()):
+                return self # manifest from before the per-session null: rebuild it
+            self.manifest = manifest
+            self.session = data['session']
+            self.event = data['event']
+            self.rt = data['rt']
+            self.frame = data['frame']
+            self.clip = data['clip']
+            self.cutoff = data['cutoff']
+        return self
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        index_path = os.path.join(self.index_dir, INDEX_FILE)
+        with open(index_path + ".tmp", "wb") as f:
+            np.savez(f, session=self.session, event=self.event, rt=self.rt, frame=self.frame,
+                     clip=self.clip, cutoff=self.cutoff)
+        os.replace(index_path + ".tmp", index_path)
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def update(self) -> int:
+        # Ingest new/changed logs, drop deleted ones. Returns files parsed.
+        on_disk = {}
+        for filename in (glob.glob(os.path.join(self.log_dir, "guesses_*.csv"))
+                         + glob.glob(os.path.join(self.log_dir, "guesses_*.t7s"))):
+            st = os.stat(filename)
+            on_disk[os.path.basename(filename)] = (st.st_mtime, st.st_size)
+        # A session converted with session_file.py exists in both formats:
+        #   count it once (the .t7s)
+        for name in list(on_disk):
+            stem, ext = os.path.splitext(name)
+            if ext == ".csv" and stem + ".t7s" in on_disk:
+                del on_disk[name]
+
+        stale = [name for name, entry in self.manifest.items()
+                 if on_disk.get(name) != (entry['mtime'], entry['size'])]
+        fresh = [name for name, stat in on_disk.items()
+                 if name not in self.manifest or name in stale]
+        if not stale and not fresh:
+            return 0
+
+        if stale:
+            drop = np.isin(self.session, [self.manifest[name]['session'] for name in stale])
+            self._keep(~drop)
+            for name in stale:
+                del self.manifest[name]
+
+        paths = [os.path.join(self.log_dir, name) for name in fresh]
+        if len(paths) >= PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor() as pool:
+                parsed = list(pool.map(_parse_log, paths, chunksize=16))
+        else:
+            parsed = [_parse_log(p) for p in paths]
+
+        next_id = max([e['session'] for e in self.manifest.values()] + [-1]) + 1
+        sessions, events, rts, frames = [self.session], [self.event], [self.rt], [self.frame]
+        clips, cutoffs = [self.clip], [self.cutoff]
+        for name, (ev, rt, fr, cl, cu, chance) in zip(fresh, parsed):
+            ev = np.frombuffer(ev, dtype=np.uint8)
+            sessions.append(np.full(len(ev), next_id, dtype=np.int32))
+            events.append(ev)
+            rts.append(np.frombuffer(rt, dtype=np.float64))
+            frames.append(np.frombuffer(fr, dtype=np.int32))
+            clips.append(np.frombuffer(cl, dtype=np.int16))
+            cutoffs.append(np.frombuffer(cu, dtype=np.float32))
+            mtime, size = on_disk[name]
+            self.manifest[name] = {'mtime': mtime, 'size': size, 'session': next_id,
+                                   'chance': chance}
+            next_id += 1
+        self.session = np.concatenate(sessions)
+        self.event = np.concatenate(events)
+        self.rt = np.concatenate(rts)
+        self.frame = np.concatenate(frames)
+        self.clip = np.concatenate(clips)
+        self.cutoff = np.concatenate(cutoffs)
+        self.save()
+        return len(fresh)
+
+    def _keep(self, mask):
+        self.session = self.session[mask]
+        self.event = self.event[mask]
+        self.rt = self.rt[mask]
+        self.frame = self.frame[mask]
+        self.clip = self.clip[mask]
+        self.cutoff = self.cutoff[mask]
+
+    def chances(self) -> dict:
+        # Session id -> significance null
+        return {e['session']: e['chance'] for e in self.manifest.values()}
+
+    def sessions(self):
+        # Returns: [(filename, session id, start datetime or None)], oldest first
+        items = [(name, e['session'], session_start(name)) for name, e in self.manifest.items()]
+        return sorted(items, key=lambda item: (item[2] or datetime.datetime.min, item[0]))
+
+
+def _rt_percentiles(rt):
+    rt = rt[~np.isnan(rt)]
+    if not len(rt):
+        return (np.nan, np.nan, np.nan)
+    return tuple(np.percentile(rt, [10, 50, 90]))
+
+def summarize(session, event, rt, chances):
+    # Stats for one group of trials (columns already selected); chances:
+    #   session id -> significance null (LogIndex.chances)
+    trials = len(event)
+    counts = np.bincount(event, minlength=len(EVENTS))
+    hits = int(counts[CORRECT_CODES].sum())
+    lows = int(counts[LOW_CODES].sum())
+    low_press = np.isin(event, LOW_PRESS_CODES)
+    # Null: the app's, per session (the block rate of always giving the
+    #   response its clip weights favour), averaged over the trials when
+    #   several sessions are pooled
+    ids, counts_per_session = np.unique(session, return_counts=True)
+    odds = (sum(chances[int(i)] * int(n) for i, n in zip(ids, counts_per_session)) / trials
+            if trials else 0.50)
+    p_value = binom_two_sided_p(trials, hits, odds) if trials else 1.0
+    return {
+        'trials': trials,
+        'block_rate': hits / trials if trials else np.nan,
+        'low_block_rate': counts[EVENT_CODES['low_block']] / lows if lows else np.nan,
+        'low_rt_p10_p50_p90': _rt_percentiles(rt[low_press]),
+        'confidence': 1 - p_value,
+    }
+
+def per_session(index: LogIndex):
+    # Returns: [(filename, start, summary)], oldest first
+    order = np.argsort(index.session, kind='stable')
+    session = index.session[order]
+    event = index.event[order]
+    rt = index.rt[order]
+    # Row range of each session id in the sorted columns
+    ids = sorted(e['session'] for e in index.manifest.values())
+    bounds = np.searchsorted(session, ids + [np.iinfo(np.int32).max])
+    starts = dict(zip(ids, bounds[:-1]))
+    ends = dict(zip(ids, bounds[1:]))
+    chances = index.chances()
+    result = []
+    for name, sid, start in index.sessions():
+        a, b = starts[sid], ends[sid]
+        result.append((name, start, summarize(session[a:b], event[a:b], rt[a:b], chances)))
+    return result
+
+
+def _format_row(label, s):
+    p10, p50, p90 = s['low_rt_p10_p50_p90']
+    return (f"{label:<20} {s['trials']:>6} {s['block_rate']*100:>6.1f}% "
+            f"{s['low_block_rate']*100:>6.1f}% {p10:>5.0f} {p50:>5.0f} {p90:>5.0f} "
+            f"{s['confidence']*100:>9.5f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize all session logs")
+    parser.add_argument("log_dir", nargs="?", default="log")
+    parser.add_argument("--last", type=int, default=20, help="sessions to list (0 = all)")
+    parser.add_argument("--rebuild", action="store_true", help="re-ingest every log")
+    args = parser.parse_args()
+
+    index = LogIndex(args.log_dir)
+    if not args.rebuild:
+        index.load()
+    parsed = index.update()
+    sessions = per_session(index)
+
+    print(f"{len(sessions)} sessions, {len(index.event)} trials ({parsed} logs ingested)")
+    print(f"{'session':<20} {'trials':>6} {'block':>7} {'lowblk':>7} "
+          f"{'p10':>5} {'p50':>5} {'p90':>5} {'signif.':>10}")
+    shown = sessions[-args.last:] if args.last else sessions
+    for name, start, s in shown:
+        label = start.strftime("%Y-%m-%d %H:%M") if start else name[:20]
+        print(_format_row(label, s))
+    print(_format_row("ALL", summarize(index.session, index.event, index.rt, index.chances())))
+
+
+if __name__ == "__main__":
+    main()
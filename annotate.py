@@ -0,0 +1,202 @@
+# Offline clip annotation: frame timings from the video itself
+#
+# Decodes each clip in fixed-size chunks of small grayscale thumbnails (one
+#   process per clip, in parallel), computes the per-frame difference energy
+#   (mean |frame[i+1] - frame[i]|) with NumPy and finds:
+#   motion_start      first frame of the attack animation (energy rises out
+#                     of the idle noise floor) -> anchors the clip's
+#                     required frame
+#   motion_end        first frame after the animation stops moving
+#   divergence_frame  first frame where the clip visibly differs from the
+#                     other clips of the batch (its mixup partners) -> the
+#                     clip's reaction frame (motion_start if there is none)
+#   total_frames/fps  as decoded
+# and writes them to a sidecar next to the clip ("<clip>.meta.json"), which
+#   scenario.apply_sidecars() picks up at startup (needs opencv-python).
+#   Nothing keeps a whole clip's frames: divergence decodes each pair of
+#   clips side by side, a chunk at a time, and keeps only the per-frame
+#   difference between them.
+#
+# Usage: python annotate.py [clip or directory ...] [--workers N]
+#                           [--threshold F] [--width PX]
+
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scenario import sidecar_path
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm")
+THUMB_WIDTH = 160     # px; plenty for motion, cheap to difference
+CHUNK_FRAMES = 64     # frames decoded per chunk
+THRESHOLD = 0.10      # fraction of the way from the noise floor to the peak
+
+
+def _thumbnails(video_path: str, width: int = THUMB_WIDTH):
+    # Yields: (fps, chunk of grayscale thumbnails uint8 [k, h, w])
+    import cv2
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    chunk = None
+    count = 0
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if chunk is None:
+                h, w = frame.shape[:2]
+                size = (width, max(1, round(h * width / w)))
+                chunk = np.empty((CHUNK_FRAMES, size[1], size[0]), dtype=np.uint8)
+            small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            chunk[count] = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            count += 1
+            if count == CHUNK_FRAMES:
+                yield fps, chunk
+                count = 0
+    finally:
+        capture.release()
+    if count:
+        yield fps, chunk[:count]
+
+def measure_clip(video_path: str, width: int = THUMB_WIDTH):
+    # Runs in worker processes. Returns: (fps, difference energy per frame
+    #   pair, number of frames)
+    fps = None
+    energy = []
+    count = 0
+    previous = None
+    for fps, chunk in _thumbnails(video_path, width):
+        frames = chunk.astype(np.int16)
+        if previous is not None:
+            frames = np.concatenate([previous[None], frames])
+        energy.append(np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2)))
+        previous = frames[-1]
+        count += len(chunk)
+    if previous is None:
+        raise IOError(f"No frames decoded from: {video_path}")
+    return fps, np.concatenate(energy), count
+
+def clip_difference(video_path: str, other_path: str, width: int = THUMB_WIDTH):
+    # Runs in worker processes. Returns: mean |difference| between the two
+    #   clips per frame, over the shorter one (None if their thumbnails
+    #   differ in size)
+    streams = _thumbnails(video_path, width), _thumbnails(other_path, width)
+    diff = []
+    try:
+        for (_, chunk), (_, other) in zip(*streams):
+            if chunk.shape[1:] != other.shape[1:]:
+                return None
+            n = min(len(chunk), len(other))
+            diff.append(np.abs(chunk[:n].astype(np.int16) - other[:n]).mean(axis=(1, 2)))
+    finally:
+        for stream in streams:
+            stream.close() # release the longer clip's capture now
+    return np.concatenate(diff) if diff else None
+
+
+def _crossing(values, threshold: float):
+    # Indices where values exceed threshold
+    return np.flatnonzero(values > threshold)
+
+def _level(values, fraction: float) -> float:
+    floor = float(np.median(values))
+    return floor + fraction * (float(values.max()) - floor)
+
+def motion_frames(energy, fraction: float = THRESHOLD):
+    # Returns: (motion_start, motion_end) frame numbers (None if no motion)
+    if not len(energy):
+        return None, None
+    moving = _crossing(energy, _level(energy, fraction))
+    if not len(moving):
+        return None, None
+    # energy[i] is the change from frame i to i+1
+    return int(moving[0]) + 1, int(moving[-1]) + 2
+
+def divergence_frame(diff, start: int, fraction: float = THRESHOLD):
+    # First frame (at or after `start`) where two clips clearly differ, or
+    #   None. `diff` is their per-frame difference (see clip_difference)
+    if diff is None or len(diff) <= start:
+        return None
+    # The two clips' idle footage needn't be identical: compare against the
+    #   difference before the animations start
+    baseline = float(np.median(diff[:start])) if start else float(diff.min())
+    threshold = baseline + fraction * (float(diff.max()) - baseline)
+    differ = _crossing(diff[start:], threshold)
+    return int(differ[0]) + start if len(differ) else None
+
+
+def annotate(video_paths, workers=None, fraction=THRESHOLD, width=THUMB_WIDTH):
+    # Returns: {video path: annotation dict}; also writes the sidecars
+    with ProcessPoolExecutor(workers) as pool:
+        measured = dict(zip(video_paths, pool.map(
+            measure_clip, video_paths, [width] * len(video_paths))))
+        # Each pair of clips at the same frame rate, once (the difference
+        #   is symmetric)
+        pairs = [(path, other) for i, path in enumerate(video_paths)
+                 for other in video_paths[i + 1:] if measured[path][0] == measured[other][0]]
+        differences = dict(zip(pairs, pool.map(
+            clip_difference, *zip(*pairs), [width] * len(pairs)) if pairs else []))
+    annotations = {}
+    for path, (fps, energy, total_frames) in measured.items():
+        start, end = motion_frames(energy, fraction)
+        # A clip is indistinguishable from its mixup partners until the last
+        #   of its divergence points from them
+        divergences = [
+            divergence_frame(diff, start or 0, fraction)
+            for pair, diff in differences.items() if path in pair
+        ]
+        divergences = [d for d in divergences if d is not None]
+        annotation = {
+            'video': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'fps': fps,
+            'total_frames': total_frames,
+            'motion_start': start,
+            'motion_end': end,
+            'divergence_frame': max(divergences) if divergences else None,
+            'energy': [round(float(e), 2) for e in energy],
+        }
+        with open(sidecar_path(path), "w", encoding="utf-8") as f:
+            json.dump(annotation, f, indent=1)
+        annotations[path] = annotation
+    return annotations
+
+
+def _collect(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos += sorted(p for p in glob.glob(os.path.join(path, "*"))
+                             if p.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect clip timings and write sidecars")
+    parser.add_argument("paths", nargs="*", default=["."], help="clips or directories of clips")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="detection level, as a fraction of noise floor -> peak")
+    parser.add_argument("--width", type=int, default=THUMB_WIDTH, help="thumbnail width (px)")
+    args = parser.parse_args()
+
+    videos = _collect(args.paths)
+    if not videos:
+        print("No clips found.")
+        return
+    for path, a in annotate(videos, args.workers, args.threshold, args.width).items():
+        print(f"{a['video']}: {a['total_frames']} frames @ {a['fps']:g} fps, "
+              f"motion {a['motion_start']}-{a['motion_end']}, "
+              f"diverges at {a['divergence_frame']} -> {sidecar_path(path)}")
+
+
+if __name__ == "__main__":
+    main()
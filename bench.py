@@ -0,0 +1,232 @@
+# Micro-benchmarks for the per-trial hot paths
+#
+# Usage: python bench.py [name ...]   (no names = run everything)
+
+import sys
+import time
+import random
+
+
+def _timeit(fn, repeat=3):
+    # Best-of-N wall time in seconds
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_significance(trials=10_000):
+    from scipy.stats import binom
+    import significance
+    from significance import SignificanceTracker, binom_two_sided_p
+
+    # The old O(n^2) implementation, kept here as the reference
+    def pmf_loop(chances, hits, odds):
+        observed_pmf = binom.pmf(hits, chances, odds)
+        return sum(
+            binom.pmf(k, chances, odds)
+            for k in range(chances + 1)
+            if binom.pmf(k, chances, odds) <= observed_pmf
+        )
+
+    rng = random.Random(0)
+    outcomes = [rng.random() < 0.55 for _ in range(trials)]
+
+    def run_tracker():
+        tracker = SignificanceTracker(0.50)
+        for hit in outcomes:
+            tracker.add(hit)
+            tracker.confidence()
+
+    default_backend = significance.BACKEND
+    try:
+        for backend in ("builtin", "scipy"):
+            significance.BACKEND = backend
+            elapsed = _timeit(run_tracker)
+            print(f"significance ({backend}): {trials} trials in {elapsed*1000:.1f} ms "
+                  f"({elapsed/trials*1e6:.1f} us/trial)")
+    finally:
+        significance.BACKEND = default_backend
+
+    # Accuracy: both backends against the old loop, along the session
+    #   (short prefix only, since the old loop is quadratic) and on every
+    #   (n, k) for small n at a few nulls, where exact ties are most common
+    import numpy as np
+    def pmf_loop_fast(chances, hits, odds):
+        # pmf_loop with one vectorized pmf call (same values, same order)
+        pmf = binom.pmf(np.arange(chances + 1), chances, odds)
+        return min(1.0, sum(pmf[pmf <= pmf[hits]].tolist()))
+
+    worst = {"builtin": 0.0, "scipy": 0.0}
+    old_time = 0.0
+    chances = hits = 0
+    checked = min(trials, 300)
+    for hit in outcomes[:checked]:
+        chances += 1
+        hits += hit
+        start = time.perf_counter()
+        expected = pmf_loop(chances, hits, 0.50)
+        old_time += time.perf_counter() - start
+        for backend in worst:
+            worst[backend] = max(worst[backend], abs(
+                binom_two_sided_p(chances, hits, 0.50, backend) - expected))
+    cases = 0
+    for odds in (0.50, 0.25, 1 / 3, 0.75):
+        for n in range(1, 80):
+            for k in range(n + 1):
+                expected = pmf_loop_fast(n, k, odds)
+                cases += 1
+                for backend in worst:
+                    worst[backend] = max(worst[backend], abs(
+                        binom_two_sided_p(n, k, odds, backend) - expected))
+    print(f"significance: old pmf loop {old_time/checked*1e6:.1f} us/trial "
+          f"over first {checked} trials")
+    print(f"significance: vs the old loop ({checked} session trials + {cases} small-n cases) "
+          + ", ".join(f"{backend} max |dp| = {dp:.2e}" for backend, dp in worst.items()))
+
+
+def _synthetic_trials(count, seed=0):
+    # Trial dicts shaped like SimpleReactionTest.trial_history entries
+    rng = random.Random(seed)
+    events = ['mid_block', 'mid_duck', 'low_block', 'low_block_late', 'low_miss']
+    trials = []
+    for _ in range(count):
+        event = rng.choice(events)
+        correct = event in ('mid_block', 'low_block')
+        rt = None if event in ('mid_block', 'low_miss') else rng.uniform(50, 400)
+        rt_type = None if rt is None else ('correct' if correct else 'incorrect')
+        trials.append({'correct': correct, 'rt': rt, 'rt_type': rt_type,
+                       'video_type': event.split('_')[0], 'event': event})
+    return trials
+
+
+def bench_rolling_stats(trials=100_000):
+    from rolling_stats import StatsAggregator
+    windows = [1, 5, 10, 25, 100, 999]
+    history = _synthetic_trials(trials)
+
+    def run():
+        stats = StatsAggregator(windows)
+        for trial in history:
+            stats.add_trial(trial)
+            for w in windows:
+                stats.window(w).avg_correct_rt
+
+    elapsed = _timeit(run)
+    print(f"rolling_stats: {trials} trials in {elapsed*1000:.1f} ms "
+          f"({elapsed/trials*1e6:.2f} us/trial)")
+
+
+def bench_pipeline(trials=20_000):
+    # Per-trial overhead of each path behind the trial state machine, driven
+    #   headlessly; each row adds one path to the previous one
+    import tempfile
+    from simulate import PlayerModel, ROLLING_WINDOWS, run
+    from trial_core import TrialRecorder
+    from trial_log import TrialLog
+
+    model = PlayerModel()
+    timings = []
+
+    def measure(label, make_recorder, on_trial=None, repeat=3):
+        def go():
+            recorder = make_recorder()
+            hook = on_trial(recorder) if on_trial else None
+            run(trials, model, recorder, seed=0, on_trial=hook)
+            if recorder is not None and recorder.log is not None:
+                recorder.log.close(keep=False)
+        timings.append((label, _timeit(go, repeat)))
+
+    measure("state machine only", lambda: None)
+    measure("+ history/stats", lambda: TrialRecorder(ROLLING_WINDOWS))
+    measure("+ significance", lambda: TrialRecorder(ROLLING_WINDOWS),
+            lambda r: lambda core: r.significance.confidence(), repeat=1)
+    with tempfile.TemporaryDirectory() as log_dir:
+        def with_log():
+            return TrialRecorder(ROLLING_WINDOWS, log=TrialLog(log_dir))
+        def per_trial(r):
+            return lambda core: (r.significance.confidence(), r.log.flush())
+        measure("+ logging", with_log, per_trial, repeat=1)
+
+    previous = 0.0
+    for label, elapsed in timings:
+        per_trial_us = elapsed / trials * 1e6
+        print(f"pipeline: {label:<20} {per_trial_us:>8.2f} us/trial "
+              f"(+{per_trial_us - previous:.2f})")
+        previous = per_trial_us
+
+
+def bench_startup(runs=5):
+    # Cold start of the app: wall time from launch to imports done, first
+    #   window shown and ready for space (clips primed). Needs a display.
+    import json
+    import statistics
+    import subprocess
+    marks = {'imported': [], 'window': [], 'ready': []}
+    for _ in range(runs):
+        launch = time.time()
+        result = subprocess.run([sys.executable, "new_minimal.py", "--startup-bench"],
+                                capture_output=True, text=True, timeout=60)
+        line = next((l for l in result.stdout.splitlines() if l.startswith("STARTUP ")), None)
+        if line is None:
+            print(f"startup: no marks reported (exit code {result.returncode})")
+            print(result.stderr.strip())
+            return
+        for name, stamp in json.loads(line[len("STARTUP "):]).items():
+            marks[name].append((stamp - launch) * 1000)
+    print(f"startup: median over {runs} runs: " + ", ".join(
+        f"{name} {statistics.median(ms):.0f} ms" for name, ms in marks.items()))
+
+
+def bench_session_load(trials=100_000):
+    # Loading a session log: CSV vs. the binary format (session_file.py)
+    import os
+    import tempfile
+    from session_file import read_session, read_session_store, store_from_records, write_session
+    from trial_store import TrialStore
+
+    store = TrialStore()
+    for trial in _synthetic_trials(trials):
+        store.append(trial['event'], trial['rt'], trial.get('frame'))
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "session.csv")
+        binary_path = os.path.join(directory, "session.t7s")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            store.write_csv(f)
+        write_session(binary_path, store, {'fps': 60})
+
+        def load_csv():
+            with open(csv_path, "r", encoding="utf-8") as f:
+                TrialStore.read_csv(f)
+
+        def map_binary():
+            _, records = read_session(binary_path)
+            records['rt'].sum() # touch every record
+
+        rows = [
+            ("csv -> TrialStore", load_csv, csv_path),
+            ("t7s -> TrialStore", lambda: read_session_store(binary_path), binary_path),
+            ("t7s memmap -> TrialStore", lambda: store_from_records(read_session(binary_path)[1]), binary_path),
+            ("t7s memmap (+ rt sum)", map_binary, binary_path),
+        ]
+        for label, load, path in rows:
+            elapsed = _timeit(load)
+            print(f"session_load: {label:<26} {elapsed*1000:>8.1f} ms "
+                  f"({os.path.getsize(path)/1e6:.2f} MB, {trials} trials)")
+
+
+BENCHMARKS = {
+    'significance': bench_significance,
+    'rolling_stats': bench_rolling_stats,
+    'pipeline': bench_pipeline,
+    'startup': bench_startup,
+    'session_load': bench_session_load,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,105 @@
+# Qt playback of pre-decoded frames (see frame_cache.py)
+#
+# CachedClipPlayer implements the handful of QMediaPlayer calls the tester
+#   uses (setPosition/position/duration/play/pause/stop, mediaStatusChanged),
+#   so it can stand in for a QMediaPlayer. Frames are painted straight from
+#   the in-memory array into a FrameView; there is no decoder or seek at the
+#   start of a trial. The displayed frame is picked from perf_counter, so a
+#   late timer tick skips ahead instead of drifting.
+
+import time
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, qRgb
+from PyQt5.QtMultimedia import QMediaPlayer
+from PyQt5.QtWidgets import QWidget
+
+
+class FrameView(QWidget):
+    def __init__(self, parent=None, palette=None):
+        super().__init__(parent)
+        self.image = None
+        self._frame = None
+        # Colour table for palette-indexed frames (see frame_cache.palette_rgb)
+        self.color_table = [qRgb(*rgb) for rgb in palette] if palette else None
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def set_frame(self, frame):
+        h, w = frame.shape[:2]
+        self._frame = frame # QImage doesn't own the buffer; keep it alive
+        if frame.ndim == 2:
+            self.image = QImage(frame.data, w, h, w, QImage.Format_Indexed8)
+            self.image.setColorTable(self.color_table)
+        else:
+            self.image = QImage(frame.data, w, h, 3 * w, QImage.Format_RGB888)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.image is None:
+            painter.fillRect(self.rect(), Qt.black)
+        else:
+            painter.drawImage(self.rect(), self.image)
+        painter.end()
+
+
+class CachedClipPlayer(QObject):
+    mediaStatusChanged = pyqtSignal(int)
+
+    def __init__(self, frames, fps, parent=None):
+        super().__init__(parent)
+        self.frames = frames
+        self.fps = fps
+        self.view = None
+        self.frame_index = 0
+        self._play_start = None
+        self._play_start_frame = 0
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        # Same handshake as QMediaPlayer once media is ready
+        QTimer.singleShot(0, lambda: self.mediaStatusChanged.emit(QMediaPlayer.LoadedMedia))
+
+    def setVideoOutput(self, view):
+        self.view = view
+        self._show(self.frame_index)
+
+    def duration(self):
+        return int(len(self.frames) * 1000 / self.fps)
+
+    def position(self):
+        return int(self.frame_index * 1000 / self.fps)
+
+    def setPosition(self, ms):
+        self.frame_index = max(0, min(len(self.frames) - 1, int(ms * self.fps / 1000)))
+        self._play_start = time.perf_counter()
+        self._play_start_frame = self.frame_index
+        self._show(self.frame_index)
+
+    def play(self):
+        self._play_start = time.perf_counter()
+        self._play_start_frame = self.frame_index
+        # Poll at ~2x the frame rate; the frame shown comes from the clock
+        self._timer.start(max(1, int(500 / self.fps)))
+
+    def pause(self):
+        self._timer.stop()
+
+    def stop(self):
+        self._timer.stop()
+        self.frame_index = 0
+
+    def _show(self, index):
+        if self.view is not None:
+            self.view.set_frame(self.frames[index])
+
+    def _tick(self):
+        elapsed = time.perf_counter() - self._play_start
+        index = self._play_start_frame + int(elapsed * self.fps)
+        if index >= len(self.frames):
+            self._timer.stop()
+            self.mediaStatusChanged.emit(QMediaPlayer.EndOfMedia)
+            return
+        if index != self.frame_index:
+            self.frame_index = index
+            self._show(index)
@@ -0,0 +1,122 @@
+# Named config profiles, applied live between trials
+#
+# A config profiles file (config_profiles.json; unrelated to the per-machine
+#   input latency profiles in profiles/) holds named sets of overrides for
+#   new_minimal.py's tunables, plus which one is active:
+#   {"active": "duomo",
+#    "profiles": {"duomo": {"SCENARIO_FILE": "scenarios/duomo.json"},
+#                 "tight": {"LOW_REQUIRED_FRAME": 76, "BREAK_WINDOW_MS": 300}}}
+#   A profile only lists what it changes; everything else keeps the value
+#   it has in new_minimal.py. The app polls the file in the break between
+#   trials (one os.stat) and applies whatever differs from the running
+#   settings, so editing the file (or "active") switches setups mid-session
+#   without a restart.
+
+import json
+import os
+
+# Tunables a profile may set, by what changing them involves in the app
+SCENARIO_SETTINGS = {  # rebuild the scenario; re-prime clips whose video changed
+    'SCENARIO_FILE', 'VIDEO_FILES', 'FPS', 'MID_TOTAL_FRAMES', 'LOW_TOTAL_FRAMES',
+    'LOW_REQUIRED_FRAME', 'REACTION_START_TIME',
+}
+SCHEDULE_SETTINGS = {'SCHEDULE_SEED', 'SCHEDULE_BLOCK', 'SCHEDULE_MAX_RUN'}
+LAYOUT_SETTINGS = {'OVERLAY_SCALE', 'ROLLING_WINDOWS'}
+PLAIN_SETTINGS = {'BREAK_WINDOW_MS'}  # read where they're used; nothing to redo
+LIVE_SETTINGS = SCENARIO_SETTINGS | SCHEDULE_SETTINGS | LAYOUT_SETTINGS | PLAIN_SETTINGS
+
+
+def _number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _int(value) -> bool:
+    return type(value) is int
+
+# setting -> (check, what it must be); a profile is rejected as a whole if
+#   any value fails, before the app touches anything
+CHECKS = {
+    'SCENARIO_FILE':       (lambda v: v is None or isinstance(v, str), "a path or null"),
+    'VIDEO_FILES':         (lambda v: isinstance(v, list) and len(v) == 2
+                            and all(isinstance(path, str) for path in v), "a list of 2 paths"),
+    'FPS':                 (lambda v: _number(v) and v > 0, "a positive number"),
+    'MID_TOTAL_FRAMES':    (lambda v: _int(v) and v > 0, "a positive integer"),
+    'LOW_TOTAL_FRAMES':    (lambda v: _int(v) and v > 0, "a positive integer"),
+    'LOW_REQUIRED_FRAME':  (lambda v: _number(v) and v > 0, "a positive number"),
+    'REACTION_START_TIME': (lambda v: _number(v) and v >= 0, "a non-negative number"),
+    'SCHEDULE_SEED':       (lambda v: v is None or _int(v), "an integer or null"),
+    'SCHEDULE_BLOCK':      (lambda v: v is None or _int(v) and v > 0, "a positive integer or null"),
+    'SCHEDULE_MAX_RUN':    (lambda v: v is None or _int(v) and v > 0, "a positive integer or null"),
+    'OVERLAY_SCALE':       (lambda v: _number(v) and v > 0, "a positive number"),
+    'ROLLING_WINDOWS':     (lambda v: isinstance(v, list) and v and len(set(v)) == len(v)
+                            and all(_int(w) and w > 0 for w in v),
+                            "a non-empty list of distinct positive integers"),
+    'BREAK_WINDOW_MS':     (lambda v: _int(v) and v >= 0, "a non-negative integer"),
+}
+
+
+def read_config_profiles(path: str):
+    # Returns: (active profile name, its settings)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get('profiles', {}), dict):
+        raise ValueError(f"{path}: expected {{\"active\": ..., \"profiles\": {{...}}}}")
+    profiles = data.get('profiles', {})
+    name = data.get('active')
+    if not isinstance(name, str) or name not in profiles:
+        raise ValueError(f"Active profile {name!r} not in {path}")
+    if not isinstance(profiles[name], dict):
+        raise ValueError(f"Profile {name!r} is not an object")
+    settings = dict(profiles[name])
+    unknown = set(settings) - LIVE_SETTINGS
+    if unknown:
+        raise ValueError(f"Profile {name!r}: unknown settings {', '.join(sorted(unknown))}")
+    for key, value in settings.items():
+        check, expected = CHECKS[key]
+        if not check(value):
+            raise ValueError(f"Profile {name!r}: {key} must be {expected}, not {value!r}")
+    return name, settings
+
+def changed_settings(current: dict, settings: dict) -> dict:
+    # The settings whose value differs from `current`
+    return {key: value for key, value in settings.items() if current.get(key) != value}
+
+def changed_clips(old, new):
+    # Indices of `new` scenario clips that need a new player (different
+    #   video, or a clip that didn't exist; all of them if the FPS changed,
+    #   as loaded clips are primed and frame-indexed at the old rate).
+    #   Other timing-only changes don't
+    if old.fps != new.fps:
+        return set(range(len(new.clips)))
+    return {i for i, clip in enumerate(new.clips)
+            if i >= len(old.clips) or old.clips[i].path != clip.path}
+
+
+class ConfigProfileWatcher:
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp = None
+        self.name = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def poll(self):
+        # Returns the active profile's settings if the file changed since the
+        #   last poll, else None. A broken file is reported and skipped (the
+        #   running settings stay) until it changes again.
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        if stamp is None:
+            return None
+        try:
+            self.name, settings = read_config_profiles(self.path)
+        except (OSError, ValueError) as e:
+            print(f"Config profiles not applied: {e}")
+            return None
+        return settings
@@ -0,0 +1,184 @@
+# Feedback sounds with a measured, low playback latency
+#
+# Both sounds are decoded once into in-memory PCM (wave + NumPy) and played
+#   through a small output stream that is opened at startup and kept running
+#   (outputting silence), so play() just swaps a buffer in and the next audio
+#   callback starts it. Needs sounddevice (pip install sounddevice); without
+#   it the QSoundEffect path is used instead.
+#
+# Every play records its call-to-output latency: for the stream, from the
+#   play() call to the DAC time of the buffer that starts the sound (as
+#   reported by PortAudio); for QSoundEffect, only until it reports playing.
+#
+# Usage: python feedback_audio.py [--backend auto|sounddevice|qt] [--count N]
+#                                 [--interval S]
+
+import argparse
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+from input_latency import distribution
+
+BLOCKSIZE = 128       # frames per callback (~3 ms at 44.1 kHz)
+HISTORY = 1000        # latencies kept per engine
+DEFAULT_SOUNDS = {'ding': "ding.wav", 'buzz': "buzz.wav"}
+
+
+def load_pcm(path: str):
+    # Returns: (int16 samples [frames, channels], sample rate)
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        channels = f.getnchannels()
+        rate = f.getframerate()
+        data = f.readframes(f.getnframes())
+    return np.frombuffer(data, dtype='<i2').reshape(-1, channels), rate
+
+
+class StreamEngine:
+    name = "sounddevice"
+
+    def __init__(self, sounds: dict, blocksize: int = BLOCKSIZE):
+        import sounddevice
+        pcm = {name: load_pcm(path) for name, path in sounds.items()}
+        rates = {rate for _, rate in pcm.values()}
+        if len(rates) != 1:
+            raise ValueError(f"feedback sounds have different sample rates: {sorted(rates)}")
+        channels = max(samples.shape[1] for samples, _ in pcm.values())
+        # Mono sounds are copied to every channel
+        self.buffers = {name: samples if samples.shape[1] == channels
+                        else np.repeat(samples, channels, axis=1)
+                        for name, (samples, _) in pcm.items()}
+        self.latencies_ms = deque(maxlen=HISTORY)
+        self._pending = None  # (buffer, stream time of the play() call)
+        self._current = None
+        self._position = 0
+        self.stream = sounddevice.OutputStream(
+            samplerate=rates.pop(), channels=channels, dtype='int16',
+            blocksize=blocksize, latency='low', callback=self._callback
+        )
+        self.stream.start()
+
+    def play(self, name: str):
+        self._pending = (self.buffers[name], self.stream.time)
+
+    def _callback(self, outdata, frames, time_info, status):
+        # Audio thread
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            self._current, requested = pending
+            self._position = 0
+            self.latencies_ms.append((time_info.outputBufferDacTime - requested) * 1000)
+        if self._current is None:
+            outdata.fill(0)
+            return
+        chunk = self._current[self._position:self._position + frames]
+        outdata[:len(chunk)] = chunk
+        outdata[len(chunk):] = 0
+        self._position += len(chunk)
+        if self._position >= len(self._current):
+            self._current = None
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class QtEngine:
+    name = "qt"
+
+    def __init__(self, sounds: dict):
+        from PyQt5.QtCore import QUrl
+        from PyQt5.QtMultimedia import QSoundEffect
+        self.effects = {}
+        self.latencies_ms = deque(maxlen=HISTORY)
+        self._requested = {}
+        for name, path in sounds.items():
+            effect = QSoundEffect()
+            effect.setSource(QUrl.fromLocalFile(path))
+            effect.playingChanged.connect(lambda name=name: self._on_playing(name))
+            self.effects[name] = effect
+
+    def play(self, name: str):
+        self._requested[name] = time.perf_counter()
+        self.effects[name].play()
+
+    def _on_playing(self, name):
+        requested = self._requested.pop(name, None)
+        if requested is not None and self.effects[name].isPlaying():
+            self.latencies_ms.append((time.perf_counter() - requested) * 1000)
+
+    def close(self):
+        for effect in self.effects.values():
+            effect.stop()
+
+
+def open_audio(backend: str = "auto", sounds: dict = DEFAULT_SOUNDS):
+    # backend: "sounddevice", "qt" or "auto" (sounddevice if it's usable)
+    if backend in ("auto", "sounddevice"):
+        try:
+            return StreamEngine(sounds)
+        except Exception as e: # missing module, no device, odd wav...
+            if backend == "sounddevice":
+                raise
+            print(f"Low-latency audio unavailable ({e}); using QSoundEffect")
+    return QtEngine(sounds)
+
+def latency_text(engine) -> str:
+    stats = distribution(list(engine.latencies_ms))
+    if not stats['n']:
+        return f"audio ({engine.name}): no plays yet"
+    return (f"audio ({engine.name}): {stats['median']:.1f} ms median, "
+            f"p10-p90 {stats['p10']:.1f}-{stats['p90']:.1f} ms ({stats['n']} plays)")
+
+
+def measure(backend: str, count: int, interval: float):
+    # Plays the sounds `count` times and prints the latency distribution
+    if backend == "qt":
+        from PyQt5.QtCore import QCoreApplication, QTimer
+        app = QCoreApplication([])
+        engine = QtEngine(DEFAULT_SOUNDS)
+        names = list(DEFAULT_SOUNDS)
+        plays = iter(range(count))
+        def tick():
+            i = next(plays, None)
+            if i is None:
+                app.quit()
+            else:
+                engine.play(names[i % len(names)])
+        timer = QTimer()
+        timer.timeout.connect(tick)
+        timer.start(int(interval * 1000))
+        app.exec_()
+    else:
+        engine = StreamEngine(DEFAULT_SOUNDS)
+        names = list(DEFAULT_SOUNDS)
+        for i in range(count):
+            engine.play(names[i % len(names)])
+            time.sleep(interval)
+    engine.close()
+    print(latency_text(engine))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure feedback sound latency")
+    parser.add_argument("--backend", choices=("auto", "sounddevice", "qt"), default="auto",
+                        help="auto = every backend that works here")
+    parser.add_argument("--count", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.3, help="seconds between plays")
+    args = parser.parse_args()
+
+    backends = ["sounddevice", "qt"] if args.backend == "auto" else [args.backend]
+    for backend in backends:
+        try:
+            measure(backend, args.count, args.interval)
+        except Exception as e:
+            print(f"audio ({backend}): unavailable ({e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Decode clips once into a compact RGB frame array, cached on disk
+#
+# The first launch decodes each clip with OpenCV (pip install opencv-python),
+#   optionally downscales it and/or reduces it to a fixed 252-colour palette
+#   (1 byte per pixel instead of 3), and saves it as a .npy file named after a
+#   hash of the video. Later launches memory-map that file instead of decoding.
+
+import hashlib
+import os
+
+import numpy as np
+
+CACHE_DIR = "cache"
+
+# Uniform 6x7x6 colour cube (more green levels, since the eye is most
+#   sensitive to it); palette index = r*42 + g*6 + b
+PALETTE_LEVELS = (6, 7, 6)
+
+
+def palette_rgb():
+    # Returns: list of (r, g, b) for every palette index
+    nr, ng, nb = PALETTE_LEVELS
+    def level(i, n):
+        return round(i * 255 / (n - 1))
+    return [(level(r, nr), level(g, ng), level(b, nb))
+            for r in range(nr) for g in range(ng) for b in range(nb)]
+
+def to_palette(frames):
+    # RGB frames [..., 3] -> palette indices [...] (uint8)
+    nr, ng, nb = PALETTE_LEVELS
+    rgb = frames.astype(np.uint16)
+    r = (rgb[..., 0] * (nr - 1) + 127) // 255
+    g = (rgb[..., 1] * (ng - 1) + 127) // 255
+    b = (rgb[..., 2] * (nb - 1) + 127) // 255
+    return (r * (ng * nb) + g * nb + b).astype(np.uint8)
+
+
+def video_hash(video_path: str) -> str:
+    h = hashlib.sha1()
+    with open(video_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+def cache_path(video_path: str, scale: float, palette: bool = False, cache_dir: str = CACHE_DIR) -> str:
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    mode = "-pal" if palette else ""
+    return os.path.join(cache_dir, f"{name}-{video_hash(video_path)}-x{scale:g}{mode}.npy")
+
+def decode_frames(video_path: str, scale: float = 1.0):
+    # Returns: (frames uint8 array [n, h, w, 3] RGB, fps)
+    import cv2
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    capture.release()
+    if not frames:
+        raise IOError(f"No frames decoded from: {video_path}")
+    return np.stack(frames), fps
+
+def _prefault(frames):
+    # Touch one byte per page so the first trial doesn't page-fault
+    flat = frames.reshape(-1)
+    int(flat[::4096].sum())
+
+def load_frames(video_path: str, scale: float = 1.0, palette: bool = False, cache_dir: str = CACHE_DIR):
+    # Returns: read-only frame array (memory-mapped from the cache file);
+    #   [n, h, w, 3] RGB, or [n, h, w] palette indices if palette=True
+    path = cache_path(video_path, scale, palette, cache_dir)
+    if not os.path.exists(path):
+        frames, _ = decode_frames(video_path, scale)
+        if palette:
+            frames = to_palette(frames)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, frames)
+        os.replace(tmp_path, path)
+    frames = np.load(path, mmap_mode="r")
+    _prefault(frames)
+    return frames
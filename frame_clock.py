@@ -0,0 +1,100 @@
+# Frame clock for the active clip
+#
+# The frame index comes from perf_counter (not from counting QTimer ticks,
+#   which run at int(1000/fps) = 16 ms and drift under load), re-anchored to
+#   the player's reported position whenever that changes, so it follows what
+#   is actually being presented. The timer only decides how often we look.
+#
+# Each trial also collects jitter numbers: how late each frame flip was
+#   noticed, how many frames were skipped between looks, and how far the
+#   perf_counter estimate had drifted from the player when it re-anchored.
+
+import datetime
+import os
+
+
+class FrameClock:
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.start(0.0)
+
+    def start(self, now: float):
+        self.anchor_time = now
+        self.anchor_frame = 0.0
+        self.frame_index = 0
+        self.last_position = None
+        # Instrumentation
+        self.ticks = 0
+        self.late_total_ms = 0.0
+        self.late_max_ms = 0.0
+        self.skipped = 0
+        self.drift_max = 0.0
+
+    def _estimate(self, now: float) -> float:
+        return self.anchor_frame + (now - self.anchor_time) * self.fps
+
+    def frame(self, now: float) -> int:
+        # Displayed frame at time `now` (never goes backwards within a trial)
+        return max(self.frame_index, int(self._estimate(now)))
+
+    def sync(self, position_ms, now: float):
+        # Re-anchor to the player's position when it reports a new one
+        if position_ms is None or position_ms == self.last_position:
+            return
+        self.last_position = position_ms
+        reported = position_ms * self.fps / 1000
+        self.drift_max = max(self.drift_max, abs(self._estimate(now) - reported))
+        self.anchor_time = now
+        self.anchor_frame = reported
+
+    def tick(self, now: float, position_ms=None) -> int:
+        self.sync(position_ms, now)
+        frame = self.frame(now)
+        self.ticks += 1
+        if frame > self.frame_index:
+            # How long ago did this frame start?
+            late_ms = (self._estimate(now) - frame) / self.fps * 1000
+            self.late_total_ms += late_ms
+            self.late_max_ms = max(self.late_max_ms, late_ms)
+            self.skipped += frame - self.frame_index - 1
+            self.frame_index = frame
+        return self.frame_index
+
+    def summary(self) -> dict:
+        flips = max(1, self.frame_index)
+        return {
+            'frames': self.frame_index,
+            'ticks': self.ticks,
+            'mean_late_ms': self.late_total_ms / flips,
+            'max_late_ms': self.late_max_ms,
+            'skipped_frames': self.skipped,
+            'max_drift_frames': self.drift_max,
+        }
+
+
+class JitterLog:
+    # Per-trial jitter summaries, appended to one CSV across sessions
+    FIELDS = ['session', 'trial', 'frames', 'ticks', 'mean_late_ms',
+              'max_late_ms', 'skipped_frames', 'max_drift_frames']
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.session = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._pending = []
+
+    def append(self, trial: int, summary: dict):
+        row = dict(summary, session=self.session, trial=trial)
+        values = [f"{v:.3f}" if isinstance(v, float) else str(v)
+                  for v in (row[field] for field in self.FIELDS)]
+        self._pending.append(",".join(values) + "\n")
+
+    def flush(self):
+        # Call between trials
+        if not self._pending:
+            return
+        new_file = not os.path.exists(self.filename)
+        with open(self.filename, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(",".join(self.FIELDS) + "\n")
+            f.writelines(self._pending)
+        self._pending = []
@@ -0,0 +1,143 @@
+# Input timing: native event timestamps and per-machine lag calibration
+#
+# EventClock maps the windowing system's key event timestamp (ms, arbitrary
+#   epoch; QKeyEvent.timestamp()) onto perf_counter. The offset between the
+#   two clocks is the smallest (perf_counter at handling - event time) seen so
+#   far, since an event can't be handled before it arrived, so presses are
+#   timed from their arrival instead of from whenever Qt got around to them.
+#   The handling delay of each event is kept as a latency distribution.
+#
+# LatencyCalibration measures the rest (keyboard + display lag): the screen
+#   flashes on a steady beat and the player taps along. The median offset of
+#   the taps from the flashes is stored per machine and window mode in a JSON
+#   profile and replaces the old hardcoded 3/60 s correction. A median
+#   outside LAG_RANGE_MS (tapping ahead of the beat, or half a beat late) is
+#   reported and not saved.
+# Known bias: tapping along to a steady beat measures the lag plus the
+#   player's own timing, and people tapping to a beat tend to tap a little
+#   early (negative mean asynchrony, typically some tens of ms). The median
+#   therefore comes out low: it underestimates the lag, and on a fast setup
+#   it can fall below 0 and be rejected. Reacting to a flash at an
+#   unpredictable moment avoids the anticipation but adds the player's whole
+#   reaction time, which can't be told apart from the lag without a
+#   zero-lag reference, so the tap-along stays and the bias is the price.
+#   Tapping "on" the flash rather than ahead of it keeps it small.
+
+import json
+import os
+import platform
+import statistics
+
+DEFAULT_INPUT_LAG_S = 3 / 60  # used until the machine has been calibrated
+PROFILE_PATH = os.path.join("profiles", "input_latency.json")
+TIMESTAMP_WRAP_MS = 2 ** 32   # event timestamps are unsigned 32-bit ms
+# A calibrated median outside this is a bad run. The lower bound is the
+#   physical one (no lag is negative), so the early-tapping bias above shows
+#   up as rejected runs rather than as a too-small correction
+LAG_RANGE_MS = (0, 150)
+
+
+class EventClock:
+    def __init__(self, history: int = 1000):
+        self.offset = None
+        self.last_event_ms = None
+        self.history = history
+        self.delays_ms = []
+
+    def reset(self):
+        self.offset = None
+        self.last_event_ms = None
+
+    def arrival(self, event_ms: int, now: float) -> float:
+        # perf_counter time the event arrived; `now` is perf_counter at handling
+        if not event_ms:
+            return now # no native timestamp on this platform
+        if self.last_event_ms is not None and event_ms < self.last_event_ms - TIMESTAMP_WRAP_MS // 2:
+            self.reset() # timestamp wrapped around
+        self.last_event_ms = event_ms
+        offset = now - event_ms / 1000
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+        arrived = event_ms / 1000 + self.offset
+        self.delays_ms.append((now - arrived) * 1000)
+        if len(self.delays_ms) > self.history:
+            del self.delays_ms[:len(self.delays_ms) - self.history]
+        return arrived
+
+    def delay_stats(self) -> dict:
+        # Handling delay (event arrival -> keyPressEvent) distribution, in ms
+        return distribution(self.delays_ms)
+
+
+def distribution(samples) -> dict:
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        'n': len(ordered),
+        'median': statistics.median(ordered),
+        'p10': pct(0.10),
+        'p90': pct(0.90),
+        'stdev': statistics.pstdev(ordered),
+    }
+
+
+class LatencyCalibration:
+    def __init__(self, beats: int = 24, interval_s: float = 0.75, warmup: int = 4):
+        self.beats = beats
+        self.interval_s = interval_s
+        self.warmup = warmup
+        self.beat_times = []
+        self.presses = []
+
+    @property
+    def done(self) -> bool:
+        return len(self.beat_times) >= self.beats
+
+    def beat(self, now: float):
+        self.beat_times.append(now)
+
+    def press(self, arrival: float):
+        self.presses.append(arrival)
+
+    def offsets_ms(self):
+        # One offset per beat: the press closest to it, within half a beat
+        offsets = []
+        half = self.interval_s / 2
+        for beat_time in self.beat_times[self.warmup:]:
+            near = [p - beat_time for p in self.presses if abs(p - beat_time) <= half]
+            if near:
+                offsets.append(min(near, key=abs) * 1000)
+        return offsets
+
+    def result(self) -> dict:
+        return distribution(self.offsets_ms())
+
+
+def plausible_lag(median_ms: float) -> bool:
+    low, high = LAG_RANGE_MS
+    return low <= median_ms <= high
+
+def machine_key(window_mode: str) -> str:
+    return f"{platform.node()}/{window_mode}"
+
+def load_profiles(path: str = PROFILE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def input_lag_s(window_mode: str, path: str = PROFILE_PATH) -> float:
+    profile = load_profiles(path).get(machine_key(window_mode))
+    if not profile or not profile.get('n') or not plausible_lag(profile['median']):
+        return DEFAULT_INPUT_LAG_S
+    return profile['median'] / 1000
+
+def save_calibration(window_mode: str, result: dict, path: str = PROFILE_PATH):
+    profiles = load_profiles(path)
+    profiles[machine_key(window_mode)] = result
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=2)
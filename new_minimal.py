@@ -1,21 +1,42 @@
 
 # Mainly authored by Perplexity AI in May 2025
 
-# Currently, this only works with blocking a mid/low mixup; anything else
-#   would require moderate modification
+# Plays a mixup of stand (mid) and duck (low) clips: by default the two
+#   VIDEO_FILES, or any number of weighted clips from a SCENARIO_FILE (see
+#   scenario.py)
 
 import sys
-import random
 import time
 import datetime
-from os import _exit, path, makedirs
-from scipy.stats import binom # to analyze results
+import json
+from dataclasses import asdict
+from os import _exit, path
+from significance import binom_two_sided_p # to analyze results
+from scenario import apply_sidecars, load_scenario, two_clip_scenario
+from schedule import Schedule
+from config_profiles import (LAYOUT_SETTINGS, LIVE_SETTINGS, SCENARIO_SETTINGS,
+                             SCHEDULE_SETTINGS, ConfigProfileWatcher, changed_clips,
+                             changed_settings)
+from trial_core import TrialCore, TrialRecorder
+from rt_distribution import LOW_PRESSES, RtFitter, block_probability
+from trial_store import TrialStore, EVENT_INFO
+from frame_clock import FrameClock, JitterLog
+from profiler import profiler
+from input_latency import (LAG_RANGE_MS, EventClock, LatencyCalibration, input_lag_s,
+                           plausible_lag, save_calibration)
+from trial_log import TrialLog, find_partial_logs, recover_partial_log, finalize_partial_log
+from session_file import SessionLog
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent, QSoundEffect
-from PyQt5.QtMultimediaWidgets import QVideoWidget
 from PyQt5.QtCore import Qt, QUrl, QTimer
 from PyQt5.QtGui import QPixmap, QFont
 
+# QtMultimedia is slow to import, so it's loaded once the window is up
+#   (see load_multimedia)
+QMediaPlayer = QMediaContent = QVideoWidget = None
+
+# Wall-clock startup marks (see bench.py: bench_startup)
+STARTUP_MARKS = {'imported': time.time()}
+
 # === CONFIGURABLE PARAMETERS ===
 # General
 OVERLAY_SCALE = 1.0          # Overlay scale
@@ -24,21 +45,64 @@ LOW_REQUIRED_FRAME = 60 + 18 # Earliest correct frame for "low" (target=18f)
 BREAK_WINDOW_MS = 500        # ms to show overlay before next trial
 DEFAULT_RES = (1024, 576)    # w,h; default (non-fullscreen) window resolution
 FULLSCREEN = True           # start in fullscreen?
+AUDIO_BACKEND = "auto"       # "sounddevice" (low latency), "qt" (QSoundEffect) or "auto"
+ADAPTIVE_CUTOFF = False      # Move the low cutoff to your estimated 75% frame (adaptive.py)
+RT_MODEL = True              # Fit your low RT distribution, show P(block) (rt_distribution.py)
 
-# Video info (make sure these are correct for the videos you use!)
+# Video info (make sure these are correct for the videos you use!
+#   `python annotate.py` measures them; its sidecar files override these)
 REACTION_START_TIME = 1.0    # Time before reaction allowed (s)
 FPS = 60                     # Video FPS
 MID_TOTAL_FRAMES = 109       # Frames for "mid" video
 LOW_TOTAL_FRAMES = 109       # Frames for "low" video
+FRAME_CLOCK_SYNC = True      # Re-anchor the frame clock to the player's position
+FRAME_CACHE = False          # Decode clips into RAM at startup (needs opencv-python)
+FRAME_CACHE_SCALE = 0.5      # Downscale factor for cached frames
+FRAME_CACHE_PALETTE = False  # Store cached frames as 252 colours (1/3 the memory)
 
-# Video selection
+# Video selection (two clips, mid/low; or a SCENARIO_FILE with any number)
 #VIDEO_FILES = ["video_mid.mp4", "video_low.mp4"] # total frames = 150
 #VIDEO_FILES = ["mid_high.mp4", "low_high.mp4"] # total frames = 150
 #VIDEO_FILES = ["mid_cutoff.mp4", "low_cutoff.mp4"] # total frames = 109
 VIDEO_FILES = ["duomo_cutoff_mid.mp4", "duomo_cutoff_low.mp4"] # total frames = 109
+SCENARIO_FILE = None         # e.g. "scenarios/duomo.json" (see scenario.py)
+PLAYER_POOL_SIZE = 6         # Clips kept loaded at once (least recently used unloaded)
+
+# Clip order (see schedule.py); the seed is saved with the session log
+SCHEDULE_SEED = None         # None = new random seed; set one to replay a session
+SCHEDULE_BLOCK = None        # e.g. 10: every 10 trials hold the clips in ratio (within one)
+SCHEDULE_MAX_RUN = None      # e.g. 4: never more than 4 of the same clip in a row
+
+# Session log format (convert between them with `python session_file.py`)
+SESSION_FORMAT = "csv"       # "csv" or "binary" (.t7s, with the run's config; see session_file.py)
+
+# Named config profiles overriding the settings above, applied live between trials
+#   (edit the file while the app runs; see config_profiles.py)
+CONFIG_PROFILES_FILE = "config_profiles.json"
 # === END CONFIGURABLE PARAMETERS ===
 
 BASE_OVERLAY_SIZE = 200     # Base overlay size in px - DO NOT CHANGE
+LOG_DIR = "log"             # Session logs (written as you go)
+STARTUP_BENCH = "--startup-bench" in sys.argv # report startup marks and quit
+DEFAULT_SETTINGS = {key: globals()[key] for key in LIVE_SETTINGS} # before any config profile
+
+def load_multimedia():
+    global QMediaPlayer, QMediaContent, QVideoWidget
+    from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
+    from PyQt5.QtMultimediaWidgets import QVideoWidget
+
+def build_scenario():
+    # From the current settings (+ annotate.py's sidecars)
+    if SCENARIO_FILE:
+        scenario = load_scenario(SCENARIO_FILE)
+    else:
+        scenario = two_clip_scenario(
+            VIDEO_FILES, FPS, MID_TOTAL_FRAMES, LOW_TOTAL_FRAMES,
+            LOW_REQUIRED_FRAME, REACTION_START_TIME
+        )
+    for name, changed in apply_sidecars(scenario):
+        print(f"{name}: {', '.join(changed)} (measured by annotate.py)")
+    return scenario
 
 # This is used to test whether the rate of blocking is statistically significant
 """"Calculate the statistical significance (p-value) and its complement for a
@@ -46,55 +110,35 @@ BASE_OVERLAY_SIZE = 200     # Base overlay size in px - DO NOT CHANGE
     expected probability under the null hypothesis."""
 def calculate_confidence(chances: int, hits: int, odds: float):
     # Returns: tuple[confidence: float, p_value: float]
-    observed_pmf = binom.pmf(hits, chances, odds)
-    p_value = sum(
-        binom.pmf(k, chances, odds)
-        for k in range(chances + 1)
-        if binom.pmf(k, chances, odds) <= observed_pmf
-    )
+    p_value = binom_two_sided_p(chances, hits, odds)
     confidence = 1 - p_value
     return (confidence, p_value)
 
 class SimpleReactionTest(QMainWindow):
-    def __init__(self, video_paths):
+    def __init__(self, scenario, config_profiles=None):
         super().__init__()
         self.setWindowTitle("Reaction Tester")
         self.resize(*DEFAULT_RES)
-        self.video_paths = video_paths
+        self.scenario = scenario
+        self.config_profiles = config_profiles # ConfigProfileWatcher (optional)
 
         # State
         self.fullscreen = FULLSCREEN
-        self.pause_after_video = False
-        self.waiting_for_space = True   # Start paused
-        self.priming_index = 0
-        self.priming = True
-
-        # Video
-        self.fps = FPS
-        self.mid_total_frames = MID_TOTAL_FRAMES
-        self.low_total_frames = LOW_TOTAL_FRAMES
-        self.low_required_frame = LOW_REQUIRED_FRAME
-        self.target_adj_RT = (self.low_required_frame - 60) / 60 * 1000
-        self.reaction_start_time = REACTION_START_TIME
+        self.priming = True         # until every clip has been primed
+        self.priming_left = set()
 
-        # Sizing
-        self.overlay_size = int(BASE_OVERLAY_SIZE * OVERLAY_SCALE)
-        self.stats_font_size = int(self.overlay_size * 0.05)
-        self.stats_label_width = int( (5+5+8*(28)) * OVERLAY_SCALE)
-        self.stats_label_height = int( (5+5+16*(len(ROLLING_WINDOWS)+1)) * OVERLAY_SCALE)
-        self.advanced_stats_font_size = int(self.overlay_size * 0.05)
-        self.advanced_stats_label_width = int( (5+5+8*(33)) * OVERLAY_SCALE)
-        self.advanced_stats_label_height = int( (5+5+16*6) * OVERLAY_SCALE)
+        # Video / trial logic (see trial_core.py; starts paused)
+        self.fps = scenario.fps
+        self.core = TrialCore(scenario)
+        self.make_schedule()
+        self.next_index = next(self.schedule)
+        self.quest = self.make_quest() # adaptive cutoff estimate (needs NumPy)
 
-        # Video widgets and players
-        self.video_widgets = [QVideoWidget(self) for _ in range(2)]
-        self.players = [QMediaPlayer(None, QMediaPlayer.VideoSurface) for _ in range(2)]
+        # Sizing
+        self.update_sizes()
 
-        for i in range(2):
-            self.players[i].setMedia(QMediaContent(QUrl.fromLocalFile(self.video_paths[i])))
-            self.players[i].setVideoOutput(self.video_widgets[i])
-            self.video_widgets[i].setGeometry(0, 0, self.width(), self.height())
-            self.video_widgets[i].hide()
+        # Clip players and their video widgets (pooled; created in setup_media)
+        self.pool = None
 
         # Overlay
         self.overlay_label = QLabel(self)
@@ -106,14 +150,11 @@ class SimpleReactionTest(QMainWindow):
             self.overlay_size
         )
         self.overlay_label.hide()
-        self.check_pixmap = QPixmap("check.png").scaled(
-            self.overlay_size, self.overlay_size,
-            Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
-        self.x_pixmap = QPixmap("x.png").scaled(
-            self.overlay_size, self.overlay_size,
-            Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
+        # Overlay images: loaded once, scaled copies cached per overlay size
+        self.check_source = QPixmap("check.png")
+        self.x_source = QPixmap("x.png")
+        self.overlay_pixmaps = {}
+        self.rescale_overlay()
 
         # Stats label
         self.stats_label = QLabel(self)
@@ -139,55 +180,137 @@ class SimpleReactionTest(QMainWindow):
         self.advanced_stats_label.setWordWrap(True)
         self.advanced_stats_label.raise_()
 
-        # Sounds
-        self.ding_sound = QSoundEffect()
-        self.ding_sound.setSource(QUrl.fromLocalFile("ding.wav"))
-        self.buzz_sound = QSoundEffect()
-        self.buzz_sound.setSource(QUrl.fromLocalFile("buzz.wav"))
+        # Timing HUD (F3), below the advanced stats tile
+        self.profiler_label = QLabel(self)
+        self.profiler_label.setFont(font)
+        self.profiler_label.setStyleSheet("background-color: white; color: black; padding: 3px;")
+        self.profiler_label.move(10, 10 + self.stats_label_height + 10 + self.advanced_stats_label_height + 10)
+        self.profiler_label.hide()
 
-        # Trial state
-        self.active_index = None
-        self.video_ended = False
+        # Frame timing
         self.frame_timer = QTimer()
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
         self.frame_timer.timeout.connect(self.on_frame_advance)
+        self.frame_clock = FrameClock(self.fps)
+        self.jitter_log = JitterLog(path.join(LOG_DIR, "frame_jitter.csv"))
         self.current_frame = 0
-        self.s_pressed = False
-        self.s_pressed_frame = None
-        self.trial_start_time = None
-        self.s_response_time = None
+
+        # Input timing (F9 while paused = calibrate input lag for this machine)
+        self.event_clock = EventClock()
+        self.input_lag = {mode: input_lag_s(mode) for mode in ('fullscreen', 'windowed')}
+        self.calibration = None
+        self.calibration_timer = QTimer()
+        self.calibration_timer.setTimerType(Qt.PreciseTimer)
+        self.calibration_timer.timeout.connect(self.on_calibration_beat)
 
         # Stats
-        self.trials = 0
-        self.correct = 0
-        self.incorrect = 0
-        self.correct_rts = []
-        self.incorrect_rts = []
-        self.trial_history = []
+        history, self.trial_log = self.open_trial_log()
+        self.recorder = TrialRecorder(
+            ROLLING_WINDOWS, history, self.trial_log, self.scenario.chance_rate()
+        )
+        self.trial_history = self.recorder.history
+        self.stats = self.recorder.stats
+        self.significance = self.recorder.significance
+        if self.quest is not None:
+            # A recovered session's lows, with the cutoffs they were judged by
+            self.quest.replay((row['cutoff'], row['event'] == 'low_block')
+                              for row in self.trial_history if row['cutoff'] is not None)
+        # Refit in the break, on a worker thread (needs NumPy)
+        self.rt_fitter = RtFitter(self.recorder.rt_distribution) if RT_MODEL else None
+        self.stats_dirty = False
+        self.stats_label.setText("Loading...")
+
+        # Show the window now; players are set up and primed right after
+        if self.fullscreen:
+            self.showFullScreen()
+        else:
+            self.showNormal()
+        QTimer.singleShot(0, self.setup_media)
 
-        # Connect signals
-        for i, player in enumerate(self.players):
-            player.mediaStatusChanged.connect(lambda status, idx=i: self.on_media_status_changed(status, idx))
+        # Profile changes while paused (in a session they're picked up in the break)
+        self.config_timer = QTimer()
+        self.config_timer.timeout.connect(self.on_config_timer)
+        self.config_timer.start(1000)
 
-        self.prime_next_video()  # Preload videos
+    def make_schedule(self):
+        self.schedule = Schedule(
+            self.scenario.weights, SCHEDULE_SEED, SCHEDULE_BLOCK, SCHEDULE_MAX_RUN
+        )
+        print(f"Schedule seed: {self.schedule.seed}")
+
+    def make_quest(self):
+        if not ADAPTIVE_CUTOFF:
+            return None
+        from adaptive import QuestThreshold
+        return QuestThreshold(
+            self.scenario.reaction_start_time * self.fps,
+            max(clip.total_frames for clip in self.scenario.clips)
+        )
 
+    def update_sizes(self):
+        self.overlay_size = int(BASE_OVERLAY_SIZE * OVERLAY_SCALE)
+        self.stats_font_size = int(self.overlay_size * 0.05)
+        self.stats_label_width = int( (5+5+8*(28)) * OVERLAY_SCALE)
+        self.stats_label_height = int( (5+5+16*(len(ROLLING_WINDOWS)+1)) * OVERLAY_SCALE)
+        self.advanced_stats_font_size = int(self.overlay_size * 0.05)
+        self.advanced_stats_label_width = int( (5+5+8*(33)) * OVERLAY_SCALE)
+        self.advanced_stats_label_height = int( (5+5+16*(6 + ADAPTIVE_CUTOFF + RT_MODEL)) * OVERLAY_SCALE)
+
+    def setup_media(self):
+        # Runs once the first window has been shown
+        STARTUP_MARKS['window'] = time.time()
+        load_multimedia()
+
+        # Sounds (preloaded; see feedback_audio.py)
+        from feedback_audio import open_audio
+        self.audio = open_audio(AUDIO_BACKEND, {'ding': "ding.wav", 'buzz': "buzz.wav"})
+
+        # Clip players: the first trial's clip plus the likeliest others,
+        #   all primed at once (from near the end) for a smoother start
+        from player_pool import PlayerPool
+        self.pool = PlayerPool(self.make_clip, PLAYER_POOL_SIZE,
+                               self.on_media_status_changed, self.on_clip_primed)
+        self.pool.pin({self.next_index})
+        warm = [self.next_index] + [i for i in self.scenario.by_weight() if i != self.next_index]
+        warm = warm[:self.pool.capacity]
+        self.priming_left = set(warm)
+        for index in warm:
+            self.pool.warm(index)
+
+    def make_clip(self, index):
+        # Player + video widget for scenario clip `index` (see PlayerPool)
+        clip = self.scenario[index]
+        if FRAME_CACHE:
+            from frame_cache import load_frames, palette_rgb
+            from cached_player import FrameView, CachedClipPlayer
+            palette = palette_rgb() if FRAME_CACHE_PALETTE else None
+            widget = FrameView(self, palette)
+            player = CachedClipPlayer(
+                load_frames(clip.path, FRAME_CACHE_SCALE, FRAME_CACHE_PALETTE),
+                self.fps, self
+            )
+        else:
+            widget = QVideoWidget(self)
+            player = QMediaPlayer(None, QMediaPlayer.VideoSurface)
+            player.setMedia(QMediaContent(QUrl.fromLocalFile(clip.path)))
+        player.setVideoOutput(widget)
+        widget.setGeometry(0, 0, self.width(), self.height())
+        widget.hide()
+        return player, widget
+
+    @profiler.timed()
     def update_stats_label(self):
         def rolling_stats(window):
-            recent = self.trial_history[-window:]
-            total = len(recent)
+            recent = self.stats.window(window)
+            total = recent.total
             if total == 0:
                 return "n/a"
-            correct = sum(1 for t in recent if t['correct'])
-            incorrect = total - correct
-            correct_pct = correct / total * 100# if total else 0
-            incorrect_pct = incorrect / total * 100# if total else 0
-            correct_rts = [t['rt'] for t in recent if t['rt_type'] == 'correct']
-            incorrect_rts = [t['rt'] for t in recent if t['rt_type'] == 'incorrect']
-            avg_correct_rt = sum(correct_rts) / len(correct_rts) if correct_rts else 0
-            avg_incorrect_rt = sum(incorrect_rts) / len(incorrect_rts) if incorrect_rts else 0
+            correct = recent.correct
+            correct_pct = correct / total * 100
             return (
                 f"{correct:>3}/{total:<3} "
                 f"{correct_pct:>3.0f}% "
-                f"{avg_correct_rt:>4.0f} {avg_incorrect_rt:>4.0f}"
+                f"{recent.avg_correct_rt:>4.0f} {recent.avg_incorrect_rt:>4.0f}"
             )
         # create header
         header = " ct    C/I     %   RTc  RTi"
@@ -201,106 +324,320 @@ class SimpleReactionTest(QMainWindow):
         self.update_advanced_stats_label()
 
     # --- NEW: Advanced stats tile update method ---
+    @profiler.timed()
     def update_advanced_stats_label(self):
-        mids_blocked = [t for t in self.trial_history if t.get('event') == 'mid_block']
-        mids_ducked = [t for t in self.trial_history if t.get('event') == 'mid_duck']
-        lows_blocked = [t for t in self.trial_history if t.get('event') == 'low_block']
-        lows_blocked_late = [t for t in self.trial_history if t.get('event') == 'low_block_late']
-        lows_missed = [t for t in self.trial_history if t.get('event') == 'low_miss']
-        confidence = calculate_confidence(len(self.trial_history), len(mids_blocked)+len(lows_blocked), 0.50)[0]
-
-        def avg_rt(lst):
-            rts = [t['rt'] for t in lst if t.get('rt') is not None]
-            return f"{sum(rts)/len(rts):.0f}" if rts else "n/a"
-
-        '''text = ( # OLD LAYOUT
-            #f"Mids/Lows blocked: {len(mids_blocked)}/{len(lows_blocked)} (+{avg_rt(lows_blocked)})\n"
-            #f"Lows blocked late: {len(lows_blocked_late)} (+{avg_rt(lows_blocked_late)})\n"
-            #f"Mids ducked: {len(mids_ducked)} (+{avg_rt(mids_ducked)})\n"
-            #f"Lows missed: {len(lows_missed)}"
-            f"   Blocked-Hit\n"
-            f"Mid    {len(mids_blocked):>3}-{len(mids_ducked)}\n"
-            f"Low    {len(lows_blocked):>3}-{len(lows_missed)+len(lows_blocked_late)}\n"
-            f"{len(lows_blocked_late):>3} ({avg_rt(lows_blocked_late)} ms) late lows\n"
-            f"{len(lows_missed):>3} missed lows\n"
-            f"{len(mids_ducked):>3} ({avg_rt(mids_ducked):>3} ms) ducked mids\n"
-        )'''
+        mids_blocked = self.stats.event('mid_block')
+        mids_ducked = self.stats.event('mid_duck')
+        lows_blocked = self.stats.event('low_block')
+        lows_blocked_late = self.stats.event('low_block_late')
+        lows_missed = self.stats.event('low_miss')
+        confidence = self.significance.confidence()
+
+        def avg_rt(event_stats):
+            rt = event_stats.avg_rt
+            return f"{rt:.0f}" if rt is not None else "n/a"
 
         text = (
             f"       |    Mid     |    Low\n"
-            f"Blocked|{len(mids_blocked):>3}         |{len(lows_blocked):>3} ({avg_rt(lows_blocked):>3} ms)\n"
-            f"Hit    |{len(mids_ducked):>3} ({avg_rt(mids_ducked):>3} ms)|{len(lows_missed)+len(lows_blocked_late):>3}\n"
-            f"Missed |            |{len(lows_missed):>3}\n"
-            f"Late   |            |{len(lows_blocked_late):>3} ({avg_rt(lows_blocked_late):>3} ms)\n"
-            f"Stat. significance={confidence*100:>13.9f}%"
+            f"Blocked|{mids_blocked.count:>3}         |{lows_blocked.count:>3} ({avg_rt(lows_blocked):>3} ms)\n"
+            f"Hit    |{mids_ducked.count:>3} ({avg_rt(mids_ducked):>3} ms)|{lows_missed.count+lows_blocked_late.count:>3}\n"
+            f"Missed |            |{lows_missed.count:>3}\n"
+            f"Late   |            |{lows_blocked_late.count:>3} ({avg_rt(lows_blocked_late):>3} ms)\n"
+            f"Signif. (vs {self.significance.odds*100:.0f}%)={confidence*100:>12.8f}%"
         )
+        if self.quest is not None and self.quest.trials:
+            mean, lo, hi = self.quest.estimate()
+            text += f"\n75% cutoff frame {mean:.1f} ({lo:.1f}-{hi:.1f})"
+        if self.rt_fitter is not None:
+            text += "\n" + self.rt_model_text()
         self.advanced_stats_label.setText(text)
         self.advanced_stats_label.raise_()
 
-    def prime_next_video(self):
-        # Preload both videos for smoother start
-        if self.priming_index < 2:
-            self.video_widgets[self.priming_index].show()
-            self.players[self.priming_index].setPosition(0)
-            self.players[self.priming_index].play()
+    def open_trial_log(self):
+        # If the last session didn't exit cleanly, pick up where it left off
+        # Returns: (trial history, log)
+        partial_logs = find_partial_logs(LOG_DIR)
+        if not partial_logs:
+            if SESSION_FORMAT == "binary":
+                return TrialStore(), SessionLog(LOG_DIR, config=self.session_config())
+            return TrialStore(), TrialLog(LOG_DIR, config=self.session_config())
+        for part_path in partial_logs[:-1]:
+            print(f"Finalized old partial log: {finalize_partial_log(part_path)}")
+        resume_path = partial_logs[-1]
+        history = recover_partial_log(resume_path)
+        print(f"Recovered {len(history)} trials from {resume_path}")
+        if resume_path.endswith(SessionLog.SUFFIX + ".part"):
+            log = SessionLog(LOG_DIR, resume_path)
         else:
-            for vw in self.video_widgets:
-                vw.hide()
-            self.priming = False
-            if self.fullscreen:
-                self.showFullScreen()
-            else:
-                self.showNormal()
-            # Start in PAUSED mode; wait for space
-            self.waiting_for_space = True
+            log = TrialLog(LOG_DIR, resume_path)
+        # The saved config describes the trials before the crash; this run's
+        #   clip order comes from a new seed, so record it from here on
+        log.add_change({'trial': len(history), 'resumed': True,
+                        'schedule': self.schedule.config()})
+        return history, log
+
+    def session_config(self):
+        # Saved with the session log (binary header / CSV sidecar)
+        return {
+            'fps': self.fps,
+            'low_required_frame': LOW_REQUIRED_FRAME,
+            'reaction_start_time': self.scenario.reaction_start_time,
+            'video_files': [clip.path for clip in self.scenario.clips],
+            'clips': [asdict(clip) for clip in self.scenario.clips],
+            'input_lag_s': self.input_lag,
+            'adaptive_cutoff': ADAPTIVE_CUTOFF,
+            'schedule': self.schedule.config(),
+            'config_profile': (self.config_profiles.name
+                               if self.config_profiles is not None else None),
+        }
+
+    def play_sound(self, name):
+        with profiler.span('sound.play'):
+            self.audio.play(name)
+
+    def update_profiler_hud(self):
+        text = profiler.hud_text()
+        if self.pool is not None: # media (and audio) is set up
+            from feedback_audio import latency_text
+            text += "\n" + latency_text(self.audio)
+        self.profiler_label.setText(text)
+        self.profiler_label.adjustSize()
+        self.profiler_label.raise_()
+
+    def rt_model_text(self):
+        # Low RT median and the fitted odds of blocking the current cutoff
+        distribution = self.recorder.rt_distribution
+        p50 = distribution.percentile(LOW_PRESSES, 50)
+        if p50 is None:
+            return "Low RT p50 n/a"
+        text = f"Low p50 {p50:.0f} p90 {distribution.percentile(LOW_PRESSES, 90):.0f}"
+        clip = next((c for c in self.scenario.clips if c.response == 'duck'), None)
+        if clip is None:
+            return text
+        frame = self.quest.next_frame() if self.quest is not None else clip.required_frame
+        p = block_probability(self.rt_fitter.poll(), distribution.press_rate(),
+                              frame, clip.reaction_frame, self.fps,
+                              distribution.anticipation_rate())
+        if p is not None:
+            text += f" P({frame:.0f}f) {p*100:.0f}%"
+        return text
+
+    def apply_outcome(self, outcome):
+        # Feedback first, then bookkeeping
+        event, rt = outcome
+        correct = EVENT_INFO[event][0]
+        self.show_overlay(correct=correct)
+        self.play_sound('ding' if correct else 'buzz')
+        self.recorder.record(event, rt, self.core.s_pressed_frame, self.core.active_index,
+                             self.core.required_frame)
+        if self.quest is not None and self.core.required_frame is not None:
+            self.quest.update(self.core.required_frame, event == 'low_block')
+        # Tiles are redrawn in the break, not while the clip is still running
+        self.stats_dirty = True
+
+    def flush_stats_label(self):
+        if self.stats_dirty:
+            self.stats_dirty = False
+            self.update_stats_label()
+
+    def on_clip_primed(self, index):
+        if self.priming:
+            self.priming_left.discard(index)
+            if not self.priming_left:
+                QTimer.singleShot(10, self.finish_priming)
+
+    def finish_priming(self):
+        self.priming = False
+        self.update_stats_label()
+        # Start in PAUSED mode; wait for space
+        self.core.waiting_for_space = True
+        STARTUP_MARKS['ready'] = time.time()
+        if STARTUP_BENCH:
+            print("STARTUP " + json.dumps(STARTUP_MARKS), flush=True)
+            self.close()
 
     def on_media_status_changed(self, status, idx):
-        if self.priming and idx == self.priming_index:
-            if status == QMediaPlayer.LoadedMedia:
-                self.players[self.priming_index].setPosition(self.players[self.priming_index].duration() - 10)
-            elif status == QMediaPlayer.EndOfMedia:
-                self.players[self.priming_index].stop()
-                self.video_widgets[self.priming_index].hide()
-                self.priming_index += 1
-                QTimer.singleShot(10, self.prime_next_video)
-            return
-
+        # Priming is handled by the pool; this only sees trial playback
         if not self.priming and status == QMediaPlayer.EndOfMedia:
+            # idle gap between trials
+            self.jitter_log.append(len(self.trial_history), self.frame_clock.summary())
+            self.jitter_log.flush()
+            self.trial_log.flush()
+            if self.rt_fitter is not None:
+                self.rt_fitter.request()
+            self.flush_stats_label()
+            if self.profiler_label.isVisible():
+                self.update_profiler_hud()
             self.overlay_label.hide()
-            self.video_ended = True
             self.frame_timer.stop()
-            if self.pause_after_video:
-                self.pause_after_video = False
-                self.waiting_for_space = True
-            else:
+            self.poll_config_profiles()
+            # Pick the next clip now so it's loaded and primed before it's needed
+            self.next_index = next(self.schedule)
+            self.pool.pin({self.core.active_index, self.next_index})
+            self.pool.warm(self.next_index)
+            if self.core.end_of_media():
                 QTimer.singleShot(BREAK_WINDOW_MS, self.start_random_video)
 
+    @profiler.timed()
     def start_random_video(self):
-        # Pick a random video and reset state
-        new_index = random.randint(0, 1)
-        if self.active_index is not None:
-            self.players[self.active_index].pause()
-            self.video_widgets[self.active_index].hide()
-        self.active_index = new_index
-        self.video_widgets[self.active_index].setGeometry(0, 0, self.width(), self.height())
-        self.video_widgets[self.active_index].show()
-        self.video_widgets[self.active_index].raise_()
+        # Play the clip queued in the break (see on_media_status_changed) and reset state
+        new_index = self.next_index
+        if self.core.active_index in self.pool:
+            previous = self.pool.get(self.core.active_index)
+            previous.player.pause()
+            previous.widget.hide()
+        clip = self.pool.take(new_index)
+        clip.widget.setGeometry(0, 0, self.width(), self.height())
+        clip.widget.show()
+        clip.widget.raise_()
         self.overlay_label.raise_()
         self.stats_label.raise_()
         self.advanced_stats_label.raise_()
-        self.players[self.active_index].setPosition(0)
-        self.players[self.active_index].play()
-        self.video_ended = False
+        clip.player.setPosition(0)
+        clip.player.play()
         self.current_frame = 0
-        self.s_pressed = False
-        self.s_pressed_frame = None
-        self.trial_start_time = time.perf_counter()
-        self.s_response_time = None
-        self.frame_timer.start(int(1000 / self.fps))
-        self.reaction_window_start = self.trial_start_time + self.reaction_start_time
-
-    # account for ~3f Py/Qt input lag here!
+        now = time.perf_counter()
+        required_frame = None
+        if self.quest is not None and self.scenario[new_index].response == 'duck':
+            required_frame = self.quest.next_frame()
+        self.core.start_trial(new_index, now, required_frame)
+        self.frame_clock.start(now)
+        # Poll well above the frame rate; the frame index comes from the clock
+        self.frame_timer.start(max(1, int(1000 / self.fps / 4)))
+
+    def on_config_timer(self):
+        # While paused; the next clip is re-picked if the schedule was replaced
+        if self.core.waiting_for_space and not self.priming and self.calibration is None:
+            if self.poll_config_profiles():
+                self.next_index = next(self.schedule)
+                self.pool.pin({self.next_index})
+                self.pool.warm(self.next_index)
+
+    def poll_config_profiles(self) -> bool:
+        # Between trials only. Returns True if the clip schedule was replaced
+        if self.config_profiles is None:
+            return False
+        settings = self.config_profiles.poll()
+        if settings is None:
+            return False
+        return self.apply_config_profile(dict(DEFAULT_SETTINGS, **settings))
+
+    @profiler.timed()
+    def apply_config_profile(self, settings) -> bool:
+        # Redo only what the changed settings affect. Returns True if the
+        #   clip schedule was replaced
+        changed = changed_settings(globals(), settings)
+        if not changed:
+            return False
+        previous = {key: globals()[key] for key in changed}
+        state = (self.scenario, self.schedule, self.quest, dict(self.stats.windows))
+        globals().update(changed)
+        try:
+            rescheduled = False
+            if changed.keys() & SCENARIO_SETTINGS:
+                self.set_scenario(build_scenario())
+                self.make_schedule()
+                if self.quest is not None:
+                    self.quest = self.make_quest() # new clips, new limit
+                rescheduled = True
+            elif changed.keys() & SCHEDULE_SETTINGS:
+                self.make_schedule()
+                rescheduled = True
+            if changed.keys() & LAYOUT_SETTINGS:
+                if 'ROLLING_WINDOWS' in changed:
+                    self.stats.set_windows(ROLLING_WINDOWS, self.trial_history)
+                self.update_sizes()
+                self.layout_tiles()
+                self.update_stats_label()
+        except Exception as e: # bad clip file, sidecar, ...: keep running as before
+            self.rollback_config_profile(previous, state)
+            print(f"Config profile {self.config_profiles.name} not applied: {e}")
+            return False
+        print(f"Config profile {self.config_profiles.name}: "
+              + ", ".join(f"{key}={value}" for key, value in changed.items()))
+        change = {'trial': len(self.trial_history),
+                  'config_profile': self.config_profiles.name,
+                  'settings': changed}
+        if rescheduled:
+            change['schedule'] = self.schedule.config()
+        if self.scenario is not state[0]:
+            change['clips'] = [asdict(clip) for clip in self.scenario.clips] # new null
+        self.trial_log.add_change(change)
+        return rescheduled
+
+    def rollback_config_profile(self, previous, state):
+        # Undo a partly applied profile: the old settings, scenario, schedule,
+        #   QUEST estimate and stats windows (as they were, not rebuilt)
+        globals().update(previous)
+        scenario, schedule, quest, windows = state
+        if self.scenario is not scenario:
+            self.set_scenario(scenario)
+        self.schedule, self.quest = schedule, quest
+        self.stats.windows = windows
+        self.update_sizes()
+        self.layout_tiles()
+        self.update_stats_label()
+
+    def set_scenario(self, scenario):
+        # Swap in a rebuilt scenario (the caller redoes the schedule); only
+        #   clips whose video changed are unloaded (and re-primed when next
+        #   warmed)
+        stale = changed_clips(self.scenario, scenario)
+        stale |= set(range(len(scenario.clips), len(self.scenario.clips)))
+        self.scenario = scenario
+        self.core.scenario = scenario
+        self.significance.set_odds(scenario.chance_rate())
+        self.fps = self.core.fps = self.frame_clock.fps = scenario.fps
+        if self.pool is not None:
+            for index in stale:
+                self.pool.discard(index)
+
+    def window_mode(self):
+        return 'fullscreen' if self.fullscreen else 'windowed'
+
+    def start_calibration(self):
+        self.calibration = LatencyCalibration()
+        print(f"Calibrating input lag ({self.window_mode()}): press S on every flash...")
+        self.calibration_timer.start(int(self.calibration.interval_s * 1000))
+
+    def on_calibration_beat(self):
+        if self.calibration.done:
+            self.finish_calibration()
+            return
+        self.overlay_label.setPixmap(self.check_pixmap)
+        self.overlay_label.show()
+        self.overlay_label.raise_()
+        self.calibration.beat(time.perf_counter())
+        QTimer.singleShot(100, self.overlay_label.hide)
+
+    def finish_calibration(self):
+        self.calibration_timer.stop()
+        result = self.calibration.result()
+        self.calibration = None
+        if result['n'] < 8:
+            print(f"Calibration discarded: only {result['n']} usable taps.")
+            return
+        if not plausible_lag(result['median']):
+            low, high = LAG_RANGE_MS
+            print(f"Calibration discarded: median {result['median']:.1f} ms is outside "
+                  f"{low}-{high} ms (tapping ahead of the flashes? tap on each one, not before it)")
+            return
+        mode = self.window_mode()
+        save_calibration(mode, result)
+        self.input_lag[mode] = result['median'] / 1000
+        print(f"Input lag ({mode}): median {result['median']:.1f} ms, "
+              f"p10-p90 {result['p10']:.1f}-{result['p90']:.1f} ms over {result['n']} taps")
+
+    @profiler.timed()
     def keyPressEvent(self, event):
+        # Time presses from when the key event arrived, not when we got to it
+        arrival = self.event_clock.arrival(event.timestamp(), time.perf_counter())
+        if self.calibration is not None:
+            if event.key() == Qt.Key_S and not event.isAutoRepeat():
+                self.calibration.press(arrival)
+            elif event.key() == Qt.Key_Escape:
+                self.finish_calibration()
+            return
         if event.key() == Qt.Key_Escape:
             self.close()
         elif event.key() == Qt.Key_F11:
@@ -312,123 +649,51 @@ class SimpleReactionTest(QMainWindow):
                 self.showFullScreen()
                 self.fullscreen = True
         elif event.key() == Qt.Key_Space:
-            if self.waiting_for_space:
-                self.waiting_for_space = False
+            if not self.priming and self.core.space() == 'start':
                 self.start_random_video()
-            elif not self.video_ended:
-                self.pause_after_video = True
-        elif event.key() == Qt.Key_S and not self.video_ended:
-            if not self.s_pressed:
-                self.s_pressed = True
-                self.s_pressed_frame = self.current_frame
-                abs_press_time = time.perf_counter()
-                raw_rt = (abs_press_time - self.trial_start_time) * 1000
-                # account for Py/Qt input lag here
-                adj_rt = (abs_press_time - self.reaction_window_start - 3/60) * 1000
-                valid_rt = adj_rt > 0
-                if self.active_index == 0:
-                    correct_bool = False
-                    self.show_overlay(correct=False)
-                    self.buzz_sound.play()
-                    self.trials += 1
-                    self.incorrect += 1
-                    if valid_rt:
-                        self.incorrect_rts.append(adj_rt)
-                    self.trial_history.append({
-                        'correct': correct_bool,
-                        'rt': adj_rt if valid_rt else None,
-                        'rt_type': 'incorrect' if valid_rt else None,
-                        'video_type': 'mid',
-                        'event': 'mid_duck'
-                    })
-                    self.update_stats_label()
-                elif self.active_index == 1:
-                    if adj_rt <= self.target_adj_RT:
-                        correct_bool = True
-                        self.show_overlay(correct=True)
-                        self.ding_sound.play()
-                        self.trials += 1
-                        self.correct += 1
-                        if valid_rt:
-                            self.correct_rts.append(adj_rt)
-                        self.trial_history.append({
-                            'correct': correct_bool,
-                            'rt': adj_rt if valid_rt else None,
-                            'rt_type': 'correct' if valid_rt else None,
-                            'video_type': 'low',
-                            'event': 'low_block'
-                        })
-                        self.update_stats_label()
-                    else:
-                        correct_bool = False
-                        self.show_overlay(correct=False)
-                        self.buzz_sound.play()
-                        self.trials += 1
-                        self.incorrect += 1
-                        if valid_rt:
-                            self.incorrect_rts.append(adj_rt)
-                        self.trial_history.append({
-                            'correct': correct_bool,
-                            'rt': adj_rt if valid_rt else None,
-                            'rt_type': 'incorrect' if valid_rt else None,
-                            'video_type': 'low',
-                            'event': 'low_block_late'
-                        })
-                        self.update_stats_label()
+        elif event.key() == Qt.Key_F3:
+            # Toggle the timing HUD
+            if self.profiler_label.isVisible():
+                self.profiler_label.hide()
+            else:
+                self.update_profiler_hud()
+                self.profiler_label.show()
+        elif event.key() == Qt.Key_F9 and self.core.waiting_for_space:
+            self.start_calibration()
+        elif event.key() == Qt.Key_S:
+            # account for this machine's input lag (calibrated, else ~3f)
+            outcome = self.core.press(
+                arrival, self.frame_clock.frame(arrival), self.input_lag[self.window_mode()]
+            )
+            if outcome:
+                self.apply_outcome(outcome)
 
     def on_frame_advance(self):
-        self.current_frame += 1
-        if self.active_index == 0:
-            if self.current_frame >= self.mid_total_frames:
-                self.frame_timer.stop()
-                self.video_ended = True
-                if not self.s_pressed:
-                    correct_bool = True
-                    self.show_overlay(correct=True)
-                    self.ding_sound.play()
-                    self.trials += 1
-                    self.correct += 1
-                    self.trial_history.append({
-                        'correct': correct_bool,
-                        'rt': None,
-                        'rt_type': None,
-                        'video_type': 'mid',
-                        'event': 'mid_block'
-                    })
-                    self.update_stats_label()
-        elif self.active_index == 1:
-            if self.current_frame >= self.low_total_frames:
-                self.frame_timer.stop()
-                self.video_ended = True
-                if not self.s_pressed:
-                    correct_bool = False
-                    self.show_overlay(correct=False)
-                    self.buzz_sound.play()
-                    self.trials += 1
-                    self.incorrect += 1
-                    self.trial_history.append({
-                        'correct': correct_bool,
-                        'rt': None,
-                        'rt_type': None,
-                        'video_type': 'low',
-                        'event': 'low_miss'
-                    })
-                    self.update_stats_label()
+        position = self.pool.get(self.core.active_index).player.position() if FRAME_CLOCK_SYNC else None
+        self.current_frame = self.frame_clock.tick(time.perf_counter(), position)
+        outcome = self.core.advance(self.current_frame)
+        if self.core.video_ended:
+            self.frame_timer.stop()
+        if outcome:
+            self.apply_outcome(outcome)
 
-    def show_overlay(self, correct=True):
-        # Show check/x overlay, rescale if needed
+    def rescale_overlay(self):
+        # Only does real work when the overlay size changes (see resizeEvent)
         self.overlay_size = int(BASE_OVERLAY_SIZE * OVERLAY_SCALE)
-        pixmap = (QPixmap("check.png") if correct else QPixmap("x.png")).scaled(
-            self.overlay_size, self.overlay_size,
-            Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
-        self.overlay_label.setPixmap(pixmap)
-        self.overlay_label.setGeometry(
-            self.width()//2 - self.overlay_size//2,
-            10,
-            self.overlay_size,
-            self.overlay_size
-        )
+        if self.overlay_size not in self.overlay_pixmaps:
+            self.overlay_pixmaps[self.overlay_size] = tuple(
+                source.scaled(
+                    self.overlay_size, self.overlay_size,
+                    Qt.KeepAspectRatio, Qt.SmoothTransformation
+                )
+                for source in (self.check_source, self.x_source)
+            )
+        self.check_pixmap, self.x_pixmap = self.overlay_pixmaps[self.overlay_size]
+
+    @profiler.timed()
+    def show_overlay(self, correct=True):
+        # Show check/x overlay (pre-scaled; positioned in resizeEvent)
+        self.overlay_label.setPixmap(self.check_pixmap if correct else self.x_pixmap)
         self.overlay_label.show()
         self.overlay_label.raise_()
         self.stats_label.raise_()
@@ -436,67 +701,71 @@ class SimpleReactionTest(QMainWindow):
         QTimer.singleShot(BREAK_WINDOW_MS, self.overlay_label.hide)
 
     def resizeEvent(self, event):
-        for vw in self.video_widgets:
+        for vw in (self.pool.widgets() if self.pool is not None else []):
             vw.setGeometry(0, 0, self.width(), self.height())
+        self.layout_tiles()
+
+    def layout_tiles(self):
+        # Overlay and tiles at the current sizes (see update_sizes)
+        self.rescale_overlay()
         self.overlay_label.setGeometry(
             self.width()//2 - self.overlay_size//2,
             10,
             self.overlay_size,
             self.overlay_size
         )
+        font = QFont("Courier New", self.stats_font_size)
+        for label in (self.stats_label, self.advanced_stats_label, self.profiler_label):
+            label.setFont(font)
+        self.stats_label.setGeometry(10, 10, self.stats_label_width, self.stats_label_height)
         self.advanced_stats_label.setGeometry(
             10,
             10 + self.stats_label_height + 10,
             self.advanced_stats_label_width,
             self.advanced_stats_label_height
         )
+        self.profiler_label.move(10, 10 + self.stats_label_height + 10 + self.advanced_stats_label_height + 10)
         self.overlay_label.raise_()
         self.stats_label.raise_()
         self.advanced_stats_label.raise_()
 
     def save_trial_history_to_csv(self):
+        # Trials are already on disk; this just closes out the session log
         print("Starting to save file...")
-        if len(self.trial_history) < 2:
+        keep = len(self.trial_history) >= 2
+        if not keep:
             print(f"Not enough guesses to save ({len(self.trial_history)}).")
-            return
-        # Format: "2025-05-03 12:02 AM"
-        now = datetime.datetime.now()
-        timestamp = now.strftime("%Y-%m-%d %I;%M %p")
-        filename = f"log/guesses_{timestamp}.csv"
-        # create the 'log' folder if it doesn't exist
-        if not path.exists('log'):
-            makedirs('log')
-        with open(filename, "w", encoding="utf-8") as f:
-            print("Opened...")
-            # Write header
-            fieldnames = list(self.trial_history[0].keys())
-            f.write(",".join(fieldnames) + "\n")
-            # Write each row
-            for row in self.trial_history:
-                # Escape commas and quotes if needed
-                values = []
-                for field in fieldnames:
-                    value = str(row[field])
-                    if ',' in value or '"' in value:
-                        value = '"' + value.replace('"', '""') + '"'
-                    values.append(value)
-                f.write(",".join(values) + "\n")
-        print(f"Saved trial history to {filename}")
+        filename = self.trial_log.close(keep)
+        if filename:
+            print(f"Saved trial history to {filename}")
 
     def closeEvent(self, event):
-        for player in self.players:
-            player.stop()
-        self.ding_sound.stop()
-        self.buzz_sound.stop()
+        if self.pool is not None: # media is set up
+            for player in self.pool.players():
+                player.stop()
+            self.audio.close()
+        if self.rt_fitter is not None:
+            self.rt_fitter.close()
         self.frame_timer.stop()
         print("Saving...")
         self.save_trial_history_to_csv()
+        if profiler.spans:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %I;%M %p")
+            profiler.dump(path.join(LOG_DIR, f"spans_{timestamp}.json"))
         event.accept()
         QApplication.quit()
         _exit(0) # must be present to close completely
 
 
 if __name__ == "__main__":
+    if STARTUP_BENCH:
+        import tempfile
+        LOG_DIR = tempfile.mkdtemp()
     app = QApplication(sys.argv)
-    window = SimpleReactionTest(VIDEO_FILES)
+    config_profiles = ConfigProfileWatcher(CONFIG_PROFILES_FILE)
+    settings = config_profiles.poll()
+    if settings:
+        globals().update(settings)
+        print(f"Config profile: {config_profiles.name}")
+    window = SimpleReactionTest(build_scenario(), config_profiles)
     sys.exit(app.exec_())
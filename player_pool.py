@@ -0,0 +1,113 @@
+# Bounded pool of loaded clip players
+#
+# Every loaded clip holds a player and a video widget (and a decoder or a
+#   frame cache), so with many clips only `capacity` of them stay loaded and
+#   the least recently used one is unloaded to make room. A newly loaded clip
+#   is primed (played from just before its end, hidden) so its decoder is
+#   warm before its first trial. The app warms the next trial's clip in the
+#   break before it, so a clip switch costs no more than replaying a clip.
+
+from collections import OrderedDict
+
+from PyQt5.QtMultimedia import QMediaPlayer
+
+PRIME_FROM_END_MS = 10
+
+
+class PooledClip:
+    __slots__ = ('index', 'player', 'widget', 'priming')
+
+    def __init__(self, index, player, widget):
+        self.index = index
+        self.player = player
+        self.widget = widget
+        self.priming = False
+
+
+class PlayerPool:
+    def __init__(self, make_clip, capacity, on_status=None, on_primed=None):
+        # make_clip(index) -> (player, widget). on_status(status, index) gets
+        #   media status changes outside of priming, on_primed(index) is
+        #   called once a clip is warm.
+        self.make_clip = make_clip
+        self.capacity = max(2, capacity) # the active clip + the next one
+        self.on_status = on_status
+        self.on_primed = on_primed
+        self.entries = OrderedDict()  # index -> PooledClip, least recently used first
+        self.pinned = set()           # never evicted (active + next clip)
+
+    def __contains__(self, index):
+        return index in self.entries
+
+    def get(self, index) -> PooledClip:
+        return self.entries[index]
+
+    def players(self):
+        return [entry.player for entry in self.entries.values()]
+
+    def widgets(self):
+        return [entry.widget for entry in self.entries.values()]
+
+    def pin(self, indices):
+        self.pinned = set(indices)
+
+    def warm(self, index) -> PooledClip:
+        # Load (and prime) clip `index` unless it's loaded already
+        entry = self.entries.get(index)
+        if entry is not None:
+            self.entries.move_to_end(index)
+            return entry
+        self._make_room()
+        player, widget = self.make_clip(index)
+        entry = PooledClip(index, player, widget)
+        player.mediaStatusChanged.connect(lambda status, e=entry: self._on_status(e, status))
+        self.entries[index] = entry
+        entry.priming = True
+        widget.show()
+        widget.lower() # under whatever is playing
+        player.setPosition(0)
+        player.play()
+        return entry
+
+    def take(self, index) -> PooledClip:
+        # Clip `index` for a trial; cuts priming short if it's still going
+        entry = self.warm(index)
+        if entry.priming:
+            entry.priming = False
+            entry.player.pause()
+        return entry
+
+    def discard(self, index):
+        # Unload clip `index` if it's loaded (e.g. its video was replaced)
+        entry = self.entries.pop(index, None)
+        if entry is not None:
+            self._unload(entry)
+
+    def _make_room(self):
+        while len(self.entries) >= self.capacity:
+            victim = next((i for i in self.entries if i not in self.pinned), None)
+            if victim is None:
+                return # everything is pinned; go over capacity for now
+            self._unload(self.entries.pop(victim))
+
+    def _unload(self, entry):
+        entry.player.stop()
+        entry.widget.hide()
+        entry.player.deleteLater()
+        entry.widget.deleteLater()
+
+    def _on_status(self, entry, status):
+        if self.entries.get(entry.index) is not entry:
+            return # unloaded
+        if entry.priming:
+            if status == QMediaPlayer.LoadedMedia:
+                entry.player.setPosition(entry.player.duration() - PRIME_FROM_END_MS)
+            elif status == QMediaPlayer.EndOfMedia:
+                entry.player.stop()
+                entry.widget.hide()
+                entry.priming = False
+                if self.on_primed is not None:
+                    self.on_primed(entry.index)
+            return
+        if self.on_status is not None:
+            self.on_status(status, entry.index)
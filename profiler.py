@@ -0,0 +1,119 @@
+# Lightweight timing spans for the hot path
+#
+# Each named span keeps its last RING_SIZE durations (ms) in a fixed-size
+#   ring buffer, so recording costs two perf_counter calls and an array store.
+#   Percentiles are only computed when someone asks (HUD refresh, dump).
+
+import json
+import time
+from array import array
+from functools import wraps
+
+RING_SIZE = 2048
+PERCENTILES = (50, 95, 99)
+
+
+class SpanRing:
+    __slots__ = ('samples', 'index', 'count')
+
+    def __init__(self, size: int = RING_SIZE):
+        self.samples = array('d', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+
+    def add(self, ms: float):
+        self.samples[self.index] = ms
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def values(self):
+        # Oldest first
+        if self.count < len(self.samples):
+            return list(self.samples[:self.index])
+        return list(self.samples[self.index:]) + list(self.samples[:self.index])
+
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class SpanProfiler:
+    def __init__(self, ring_size: int = RING_SIZE):
+        self.ring_size = ring_size
+        self.spans = {}
+        self.enabled = True
+
+    def record(self, name: str, ms: float):
+        ring = self.spans.get(name)
+        if ring is None:
+            ring = self.spans[name] = SpanRing(self.ring_size)
+        ring.add(ms)
+
+    def span(self, name: str):
+        return _Span(self, name)
+
+    def timed(self, name: str = None):
+        # Decorator: time every call of the wrapped function
+        def decorator(fn):
+            span_name = name or fn.__name__
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(span_name, (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+
+    def summary(self) -> dict:
+        # span -> {'count', 'p50', 'p95', 'p99', 'max'} (ms, over the ring)
+        result = {}
+        for name, ring in self.spans.items():
+            ordered = sorted(ring.values())
+            if not ordered:
+                continue
+            stats = {'count': ring.count}
+            for p in PERCENTILES:
+                stats[f'p{p}'] = _percentile(ordered, p)
+            stats['max'] = ordered[-1]
+            result[name] = stats
+        return result
+
+    def hud_text(self) -> str:
+        width = max([len(name) for name in self.spans] + [4])
+        lines = [f"{'span':<{width}}    p50    p95    p99 (ms)"]
+        for name, stats in sorted(self.summary().items()):
+            lines.append(f"{name:<{width}} {stats['p50']:>6.2f} {stats['p95']:>6.2f} {stats['p99']:>6.2f}")
+        return "\n".join(lines)
+
+    def dump(self, filename: str):
+        data = {
+            'summary': self.summary(),
+            'samples_ms': {name: ring.values() for name, ring in self.spans.items()},
+        }
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler.enabled:
+            self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+# Shared instance for the app (so methods can be decorated at class level)
+profiler = SpanProfiler()
@@ -0,0 +1,147 @@
+# Incremental stats for the stats tiles (no Qt here, so it can be tested alone)
+#
+# Every rolling window keeps its own ring buffer plus running sums, so adding
+#   a trial (and evicting the one that falls out of each window) is O(1) per
+#   window no matter how long the session has been going.
+
+from collections import deque
+from math import isnan
+
+from trial_store import EVENTS, EVENT_INFO, rt_type_for
+
+
+class WindowStats:
+    __slots__ = ('size', 'buffer', 'total', 'correct',
+                 'correct_rt_sum', 'correct_rt_count',
+                 'incorrect_rt_sum', 'incorrect_rt_count')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer = deque()
+        self.total = 0
+        self.correct = 0
+        self.correct_rt_sum = 0.0
+        self.correct_rt_count = 0
+        self.incorrect_rt_sum = 0.0
+        self.incorrect_rt_count = 0
+
+    def _apply(self, correct, rt, rt_type, sign):
+        self.total += sign
+        if correct:
+            self.correct += sign
+        if rt_type == 'correct':
+            self.correct_rt_sum += sign * rt
+            self.correct_rt_count += sign
+        elif rt_type == 'incorrect':
+            self.incorrect_rt_sum += sign * rt
+            self.incorrect_rt_count += sign
+
+    def push(self, correct: bool, rt, rt_type):
+        entry = (correct, rt, rt_type)
+        self.buffer.append(entry)
+        self._apply(*entry, 1)
+        if len(self.buffer) > self.size:
+            self._apply(*self.buffer.popleft(), -1)
+
+    @property
+    def incorrect(self) -> int:
+        return self.total - self.correct
+
+    @property
+    def avg_correct_rt(self) -> float:
+        if not self.correct_rt_count:
+            return 0
+        return self.correct_rt_sum / self.correct_rt_count
+
+    @property
+    def avg_incorrect_rt(self) -> float:
+        if not self.incorrect_rt_count:
+            return 0
+        return self.incorrect_rt_sum / self.incorrect_rt_count
+
+
+class EventStats:
+    __slots__ = ('count', 'rt_sum', 'rt_count')
+
+    def __init__(self):
+        self.count = 0
+        self.rt_sum = 0.0
+        self.rt_count = 0
+
+    def add(self, rt):
+        self.count += 1
+        if rt is not None:
+            self.rt_sum += rt
+            self.rt_count += 1
+
+    @property
+    def avg_rt(self):
+        # None when no trial of this event had a valid RT
+        if not self.rt_count:
+            return None
+        return self.rt_sum / self.rt_count
+
+
+class StatsAggregator:
+    def __init__(self, windows, events=EVENTS):
+        self.windows = {w: WindowStats(w) for w in windows}
+        self.events = {e: EventStats() for e in events}
+        self.trials = 0
+
+    def add(self, correct: bool, rt, rt_type, event: str):
+        self.trials += 1
+        for window in self.windows.values():
+            window.push(correct, rt, rt_type)
+        self.events.setdefault(event, EventStats()).add(rt)
+
+    def add_trial(self, trial: dict):
+        self.add(trial['correct'], trial['rt'], trial['rt_type'], trial['event'])
+
+    def add_event(self, event: str, rt=None):
+        correct = EVENT_INFO[event][0]
+        self.add(correct, rt, rt_type_for(correct, rt), event)
+
+    @classmethod
+    def from_store(cls, store, windows, events=EVENTS):
+        # Rebuild from a TrialStore: event totals via vectorized reductions,
+        #   windows from the tail of the store only
+        stats = cls(windows, events)
+        stats.trials = len(store)
+        if not len(store):
+            return stats
+        counts = store.event_counts()
+        for event, (rt_sum, rt_count) in store.event_rt_sums().items():
+            totals = stats.event(event)
+            totals.count = counts[event]
+            totals.rt_sum = rt_sum
+            totals.rt_count = rt_count
+        _fill_windows(stats.windows.values(), store)
+        return stats
+
+    def set_windows(self, windows, store):
+        # Switch to `windows` (sizes): windows that stay keep their state, only
+        #   new ones are rebuilt (from the tail of `store`, the history so far)
+        new = {w: WindowStats(w) for w in windows if w not in self.windows}
+        _fill_windows(new.values(), store)
+        self.windows = {w: self.windows.get(w) or new[w] for w in windows}
+
+    def window(self, size: int) -> WindowStats:
+        return self.windows[size]
+
+    def event(self, event: str) -> EventStats:
+        return self.events.setdefault(event, EventStats())
+
+
+def _fill_windows(windows, store):
+    # Push the last trials of `store` into (empty) windows
+    windows = list(windows)
+    if not windows or not len(store):
+        return
+    start = max(0, len(store) - max(window.size for window in windows))
+    for i in range(start, len(store)):
+        event = EVENTS[store.events[i]]
+        correct = EVENT_INFO[event][0]
+        rt = store.rts[i]
+        rt = None if isnan(rt) else rt
+        for window in windows:
+            window.push(correct, rt, rt_type_for(correct, rt))
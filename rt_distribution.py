@@ -0,0 +1,256 @@
+# Reaction-time distributions, not just means
+#
+# RtDistribution keeps a fixed-bin histogram of adjusted RTs per event (one
+#   counter increment per trial, fixed memory however long the session).
+#   RtFitter refits an ex-Gaussian model to the low-press histogram on a
+#   worker thread, so the main thread only ever snapshots counts and reads
+#   the last finished fit. The model gives P(block) for any cutoff frame:
+#   P(anticipating) + P(a timed press on a low) * P(RT <= cutoff).
+#   Anticipations (pressed before the reaction window: low_block with no RT)
+#   block at any cutoff and aren't in the histogram, so they're a separate
+#   term rather than part of the press rate.
+#
+# Fit: ex-Gaussian (normal + exponential tail, the usual shape of human RTs)
+#   by binned maximum likelihood, as a zooming grid search from the
+#   method-of-moments estimate, vectorized with NumPy. It works on the bins,
+#   not the trials, so it costs the same however long the session is.
+#
+# Usage: python rt_distribution.py LOG [--frames F ...]   (CSV or .t7s log)
+
+import argparse
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from math import sqrt
+
+from trial_store import EVENTS, TrialStore, _np
+
+BIN_MS = 5
+MAX_MS = 1000           # RTs above this share the last bin
+MIN_FIT_RTS = 10
+FIT_GRID = 7            # values per parameter per search round
+FIT_ROUNDS = 5
+SQRT2 = sqrt(2)
+LOW_PRESSES = ('low_block', 'low_block_late')
+LOW_EVENTS = ('low_block', 'low_block_late', 'low_miss')
+
+
+class RtDistribution:
+    def __init__(self, bin_ms: int = BIN_MS, max_ms: int = MAX_MS, events=EVENTS):
+        self.bin_ms = bin_ms
+        self.bins = max_ms // bin_ms + 1
+        self.hist = {event: array('L', [0]) * self.bins for event in events}
+        self.events = {event: 0 for event in events}  # trials, with or without an RT
+
+    def add(self, event: str, rt):
+        self.events[event] += 1
+        if rt is not None:
+            self.hist[event][min(int(rt // self.bin_ms), self.bins - 1)] += 1
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        # Vectorized rebuild from a TrialStore
+        dist = cls(**kwargs)
+        if not len(store):
+            return dist
+        np = _np()
+        events, rts, _ = store.columns()
+        valid = ~np.isnan(rts)
+        bins = np.minimum((rts[valid] // dist.bin_ms).astype(np.int64), dist.bins - 1)
+        for code, event in enumerate(EVENTS):
+            if event not in dist.hist:
+                continue
+            dist.events[event] = int((events == code).sum())
+            counts = np.bincount(bins[events[valid] == code], minlength=dist.bins)
+            dist.hist[event] = array('L', [int(n) for n in counts])
+        return dist
+
+    def counts(self, events) -> list:
+        # Summed histogram over `events`
+        total = [0] * self.bins
+        for event in events:
+            for i, n in enumerate(self.hist[event]):
+                total[i] += n
+        return total
+
+    def centers(self) -> list:
+        return [(i + 0.5) * self.bin_ms for i in range(self.bins)]
+
+    def percentile(self, events, p: float):
+        # From the histogram (bin centre), None if there are no RTs
+        counts = self.counts(events)
+        total = sum(counts)
+        if not total:
+            return None
+        running = 0
+        for i, n in enumerate(counts):
+            running += n
+            if running >= p / 100 * total:
+                return (i + 0.5) * self.bin_ms
+        return (self.bins - 0.5) * self.bin_ms
+
+    def press_rate(self) -> float:
+        # Share of lows that got a press with an RT, i.e. the presses the
+        #   histogram holds (None before any low)
+        lows = sum(self.events[e] for e in LOW_EVENTS)
+        if not lows:
+            return None
+        return sum(self.counts(LOW_PRESSES)) / lows
+
+    def anticipation_rate(self) -> float:
+        # Share of lows pressed before the reaction window (no RT; None
+        #   before any low)
+        lows = sum(self.events[e] for e in LOW_EVENTS)
+        if not lows:
+            return None
+        presses = sum(self.events[e] for e in LOW_PRESSES)
+        return (presses - sum(self.counts(LOW_PRESSES))) / lows
+
+
+def _log_erfc(x):
+    # log(erfc(x)) for x >= 0, vectorized (Numerical Recipes' erfcc, rel.
+    #   error < 1.2e-7; NumPy has no erf and the fit shouldn't need SciPy)
+    np = _np()
+    t = 1 / (1 + 0.5 * x)
+    poly = -1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+        -0.82215223 + t * 0.17087277))))))))
+    return np.log(t) - x * x + poly
+
+def _log_ndtr(z):
+    # log Phi(z), accurate far into both tails
+    np = _np()
+    x = -np.asarray(z, dtype=float) / SQRT2
+    lower = np.log(0.5) + _log_erfc(np.abs(x))
+    return np.where(x >= 0, lower, np.log1p(-np.exp(lower)))
+
+def exgauss_cdf(x, mu, sigma, tau):
+    # P(RT <= x) for an ex-Gaussian (normal(mu, sigma) + exponential(tau));
+    #   broadcasts over x and the parameters
+    np = _np()
+    z = (x - mu) / sigma
+    tail = -(x - mu) / tau + sigma ** 2 / (2 * tau ** 2) + _log_ndtr(z - sigma / tau)
+    return np.exp(_log_ndtr(z)) - np.exp(tail)
+
+def _moments_fit(x, w):
+    # Method of moments: the start point for the likelihood search
+    n = w.sum()
+    mean = (x * w).sum() / n
+    var = ((x - mean) ** 2 * w).sum() / n
+    sd = sqrt(var)
+    skew = ((x - mean) ** 3 * w).sum() / n / sd ** 3
+    tau = sd * min(max(skew / 2, 0.01), 0.9) ** (1 / 3)
+    return mean - tau, sqrt(max(var - tau ** 2, (0.1 * sd) ** 2)), tau
+
+def fit_exgauss(centers, counts, bin_ms=BIN_MS):
+    # Binned maximum likelihood. Returns:
+    #   {'mu', 'sigma', 'tau', 'n'} (ms), or None with too few RTs
+    np = _np()
+    x = np.asarray(centers, dtype=float)
+    w = np.asarray(counts, dtype=float)
+    n = w.sum()
+    if n < MIN_FIT_RTS or np.count_nonzero(w) < 3:
+        return None
+    # Bin edges; the last bin is open-ended (its upper CDF is 1)
+    edges = np.append(x - bin_ms / 2, x[-1] + bin_ms / 2)
+    keep = w > 0
+    params = np.array(_moments_fit(x[keep], w[keep]))
+    w = w[keep]
+    span = params * 0.5
+    grid = np.linspace(-1, 1, FIT_GRID)
+    for _ in range(FIT_ROUNDS):
+        # Zooming grid search over (mu, sigma, tau) around the best so far
+        mu, sigma, tau = (a.reshape(-1, 1) for a in np.meshgrid(
+            *(np.maximum(p + s * grid, 1.0) for p, s in zip(params, span)), indexing='ij'))
+        cdf = exgauss_cdf(edges, mu, sigma, tau)
+        cdf[:, -1] = 1.0
+        mass = np.maximum(np.diff(cdf, axis=1)[:, keep], 1e-300)
+        best = int(np.argmax((w * np.log(mass)).sum(axis=1)))
+        params = np.array([mu[best, 0], sigma[best, 0], tau[best, 0]])
+        span = span * 2 / (FIT_GRID - 1)
+    return {'mu': float(params[0]), 'sigma': float(params[1]),
+            'tau': float(params[2]), 'n': int(n)}
+
+def model_cdf(model, rt_ms: float) -> float:
+    # P(RT <= rt_ms) under a fitted model
+    return float(exgauss_cdf(rt_ms, model['mu'], model['sigma'], model['tau']))
+
+def cutoff_rt_ms(required_frame: float, reaction_frame: float, fps: float) -> float:
+    # Latest adjusted RT that still makes `required_frame` (as in TrialCore)
+    return (required_frame - reaction_frame) / fps * 1000
+
+def block_probability(model, press_rate, required_frame, reaction_frame, fps,
+                      anticipation_rate=0.0):
+    if model is None or press_rate is None:
+        return None
+    return anticipation_rate + press_rate * model_cdf(
+        model, cutoff_rt_ms(required_frame, reaction_frame, fps))
+
+
+class RtFitter:
+    # Refits the low-press model in the background; never waits on it
+    def __init__(self, distribution: RtDistribution, events=LOW_PRESSES):
+        self.distribution = distribution
+        self.events = events
+        self.model = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rt-fit")
+        self._future = None
+        self._fitted_n = None
+
+    def request(self):
+        # Call in the break: starts a refit if the data changed and none is running
+        self.poll()
+        counts = self.distribution.counts(self.events)
+        n = sum(counts)
+        if self._future is not None or n == self._fitted_n:
+            return
+        self._fitted_n = n
+        self._future = self._executor.submit(
+            fit_exgauss, self.distribution.centers(), counts
+        )
+
+    def poll(self):
+        # Picks up a finished fit (non-blocking). Returns the current model
+        if self._future is not None and self._future.done():
+            future, self._future = self._future, None
+            if future.exception() is None and future.result() is not None:
+                self.model = future.result()
+        return self.model
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Low RT distribution and block odds per cutoff")
+    parser.add_argument("log", help="session log (.csv or .t7s)")
+    parser.add_argument("--frames", type=float, nargs="+", default=[74, 76, 78, 80, 82],
+                        help="cutoff frames to predict")
+    parser.add_argument("--reaction-frame", type=float, default=60)
+    parser.add_argument("--fps", type=float, default=60)
+    args = parser.parse_args()
+
+    if args.log.endswith(".t7s"):
+        from session_file import read_session_store
+        store = read_session_store(args.log)
+    else:
+        with open(args.log, "r", encoding="utf-8") as f:
+            store = TrialStore.read_csv(f)
+    dist = RtDistribution.from_store(store)
+    model = fit_exgauss(dist.centers(), dist.counts(LOW_PRESSES))
+    if model is None:
+        print("Not enough low presses to fit.")
+        return
+    p50, p90 = (dist.percentile(LOW_PRESSES, p) for p in (50, 90))
+    print(f"{model['n']} low presses: p50 {p50:.0f} ms, p90 {p90:.0f} ms; "
+          f"ex-Gaussian mu={model['mu']:.0f} sigma={model['sigma']:.0f} "
+          f"tau={model['tau']:.0f} ms; pressed on {dist.press_rate()*100:.1f}% of lows, "
+          f"anticipated {dist.anticipation_rate()*100:.1f}%")
+    for frame in args.frames:
+        p = block_probability(model, dist.press_rate(), frame, args.reaction_frame, args.fps,
+                              dist.anticipation_rate())
+        print(f"cutoff frame {frame:g} ({cutoff_rt_ms(frame, args.reaction_frame, args.fps):.0f} ms): "
+              f"P(block) {p*100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Data-driven mixup scenarios
+#
+# A scenario is a list of clips, each declaring its correct response and the
+#   frames it's judged on, so any number of mids/lows/delays can be mixed
+#   without touching the trial logic. Scenarios are JSON files:
+#
+# {
+#   "fps": 60,
+#   "reaction_start_time": 1.0,
+#   "clips": [
+#     {"name": "df1", "path": "df1.mp4", "response": "stand", "total_frames": 109},
+#     {"name": "db3", "path": "db3.mp4", "response": "duck", "total_frames": 109,
+#      "required_frame": 78, "weight": 2}
+#   ]
+# }
+#
+# response: "stand" (correct = no press; a press is a duck into the mid) or
+#   "duck" (correct = S by required_frame; later is late, none is a miss).
+# Optional per clip: reaction_frame (RTs are measured from here; defaults to
+#   reaction_start_time * fps) and weight (relative pick chance, default 1).
+
+import json
+import os
+from dataclasses import dataclass
+
+# response -> video_type in the trial log
+RESPONSES = {'stand': 'mid', 'duck': 'low'}
+SIDECAR_SUFFIX = ".meta.json" # written by annotate.py
+
+
+@dataclass
+class Clip:
+    name: str
+    path: str
+    response: str               # 'stand' or 'duck'
+    total_frames: int
+    required_frame: int = None  # duck clips: last frame the duck still blocks
+    reaction_frame: int = None  # frame RTs are measured from (None = scenario default)
+    weight: float = 1.0
+
+    @property
+    def video_type(self) -> str:
+        return RESPONSES[self.response]
+
+
+class Scenario:
+    def __init__(self, clips, fps=60, reaction_start_time=1.0):
+        if not clips:
+            raise ValueError("scenario has no clips")
+        self.clips = list(clips)
+        self.fps = fps
+        self.reaction_start_time = reaction_start_time
+        for clip in self.clips:
+            if clip.response not in RESPONSES:
+                raise ValueError(f"clip {clip.name!r}: unknown response {clip.response!r}")
+            if clip.response == 'duck' and clip.required_frame is None:
+                raise ValueError(f"clip {clip.name!r}: duck clips need a required_frame")
+            if clip.reaction_frame is None:
+                clip.reaction_frame = round(reaction_start_time * fps)
+        self.weights = [clip.weight for clip in self.clips]
+
+    def __len__(self):
+        return len(self.clips)
+
+    def __getitem__(self, index: int) -> Clip:
+        return self.clips[index]
+
+    def chance_rate(self) -> float:
+        # Best block rate from giving one response every time (e.g. always
+        #   standing on a 70/30 mid/low mix blocks 70%): the significance null
+        shares = {}
+        for clip, weight in zip(self.clips, self.weights):
+            shares[clip.response] = shares.get(clip.response, 0) + weight
+        return max(shares.values()) / sum(self.weights)
+
+    def by_weight(self):
+        # Clip indices, most likely first
+        return sorted(range(len(self.clips)), key=lambda i: -self.weights[i])
+
+
+def two_clip_scenario(video_files, fps, mid_total_frames, low_total_frames,
+                      low_required_frame, reaction_start_time):
+    # The original mid/low setup
+    mid_path, low_path = video_files
+    return Scenario([
+        Clip('mid', mid_path, 'stand', mid_total_frames),
+        Clip('low', low_path, 'duck', low_total_frames, low_required_frame),
+    ], fps, reaction_start_time)
+
+def load_scenario(filename: str) -> Scenario:
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    clips = [Clip(**clip) for clip in data['clips']]
+    return Scenario(clips, data.get('fps', 60), data.get('reaction_start_time', 1.0))
+
+def sidecar_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + SIDECAR_SUFFIX
+
+def load_sidecar(video_path: str):
+    # annotate.py's measurements for a clip (None if missing or out of date)
+    try:
+        with open(sidecar_path(video_path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(video_path) or meta.get('size') != os.path.getsize(video_path):
+        return None
+    return meta
+
+def _rescale(frame, ratio: float):
+    # A frame number at a new frame rate (same moment in time); whole when
+    #   it lands on a frame
+    frame *= ratio
+    return round(frame) if abs(frame - round(frame)) < 1e-9 else frame
+
+def apply_sidecars(scenario: Scenario):
+    # Replace hand-entered clip timings with measured ones:
+    #   fps            the decoded rate (if every clip has a sidecar and they
+    #                  agree); hand-entered frame numbers are rescaled to it
+    #   total_frames   as decoded
+    #   reaction_frame the divergence frame (first frame the clip can be told
+    #                  apart from its mixup partners), else the motion start
+    #   required_frame keeps its distance from the motion start, as the
+    #                  hit is a fixed frame of the animation
+    #   Returns: [(clip name, [changed fields])]
+    changes = []
+    metas = [load_sidecar(clip.path) for clip in scenario.clips]
+    rates = {meta['fps'] for meta in metas if meta}
+    if len(rates) == 1 and all(metas):
+        fps = round(rates.pop())
+        if fps != scenario.fps:
+            changes.append(('scenario', [f"fps {scenario.fps} -> {fps}"]))
+            ratio = fps / scenario.fps
+            for clip in scenario.clips:
+                clip.reaction_frame = _rescale(clip.reaction_frame, ratio)
+                if clip.required_frame is not None:
+                    clip.required_frame = _rescale(clip.required_frame, ratio)
+            scenario.fps = fps
+    for clip, meta in zip(scenario.clips, metas):
+        if meta is None or meta.get('fps') is None or round(meta['fps']) != scenario.fps:
+            continue # measured at another rate than the scenario plays at
+        changed = []
+        if meta['total_frames'] != clip.total_frames:
+            changed.append(f"total_frames {clip.total_frames} -> {meta['total_frames']}")
+            clip.total_frames = meta['total_frames']
+        start = meta.get('motion_start')
+        if start is not None and clip.required_frame is not None:
+            # The hand-entered reaction frame is where the animation starts
+            required = clip.required_frame + start - clip.reaction_frame
+            if required != clip.required_frame:
+                changed.append(f"required_frame {clip.required_frame} -> {required}")
+                clip.required_frame = required
+        reaction = meta.get('divergence_frame')
+        if reaction is None:
+            reaction = start
+        if reaction is not None and reaction != clip.reaction_frame:
+            changed.append(f"reaction_frame {clip.reaction_frame} -> {reaction}")
+            clip.reaction_frame = reaction
+        if changed:
+            changes.append((clip.name, changed))
+    return changes
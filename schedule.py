@@ -0,0 +1,115 @@
+# Seeded, constrained clip order for a session
+#
+# The whole session's clip sequence follows from one seed (drawn at random
+#   unless given, and stored with the session log), so any run can be
+#   replayed exactly. It is generated lazily, a trial or a block at a time,
+#   so sessions can go on forever. Constraints:
+#   weights     relative share of each clip (the scenario's clip weights)
+#   block_size  every block of this many trials holds each clip in
+#               proportion to its weight (so a 50/50 mixup really is 50/50).
+#               When the weights don't divide the block evenly, the
+#               fractional shares carry over to the next block, so the
+#               long-run mix is still exact (a 50/50 block of 5 alternates
+#               3+2 and 2+3)
+#   max_run     never more than this many of the same clip in a row
+# Note that constraints make the order partly predictable (after max_run
+#   mids, a low is certain), so keep max_run loose.
+
+import random
+from itertools import islice
+
+BLOCK_RETRIES = 100 # reshuffles before a block may break max_run
+
+
+class Schedule:
+    def __init__(self, weights, seed=None, block_size=None, max_run=None):
+        for name, value in (('block_size', block_size), ('max_run', max_run)):
+            if value is not None and (type(value) is not int or value < 1):
+                raise ValueError(f"{name} must be a positive integer or None, not {value!r}")
+        if not weights or any(w < 0 for w in weights) or not any(weights):
+            raise ValueError(f"weights must be non-negative with some positive, not {weights!r}")
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.seed = seed
+        self.weights = list(weights)
+        self.block_size = block_size
+        self.max_run = max_run
+        self._rng = random.Random(seed)
+        self._stream = self._blocks() if block_size else self._trials()
+        self._last = None
+        self._run = 0
+
+    def config(self) -> dict:
+        # Everything needed to replay the schedule
+        return {'seed': self.seed, 'weights': self.weights,
+                'block_size': self.block_size, 'max_run': self.max_run}
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        index = next(self._stream)
+        self._run = self._run + 1 if index == self._last else 1
+        self._last = index
+        return index
+
+    def take(self, count: int):
+        return list(islice(self, count))
+
+    def _blocked(self, index, last, run) -> bool:
+        # Would `index` make the run too long?
+        return self.max_run is not None and index == last and run >= self.max_run
+
+    def _trials(self):
+        # Weighted draws; a clip that would break max_run sits out one draw
+        indices = range(len(self.weights))
+        while True:
+            weights = [0 if self._blocked(i, self._last, self._run) else w
+                       for i, w in zip(indices, self.weights)]
+            if not any(weights):
+                weights = self.weights
+            yield self._rng.choices(indices, weights)[0]
+
+    def block_counts(self, carry=None):
+        # Clip counts for one block: largest-remainder rounding of the
+        #   weights' shares plus `carry` (what earlier blocks owe each clip).
+        #   Returns: (counts, carry for the next block)
+        total = sum(self.weights)
+        exact = [w / total * self.block_size for w in self.weights]
+        if carry is not None:
+            exact = [x + c for x, c in zip(exact, carry)]
+        counts = [max(0, int(x)) for x in exact]
+        by_remainder = sorted((i for i, w in enumerate(self.weights) if w),
+                              key=lambda i: counts[i] - exact[i])
+        for i in by_remainder[:self.block_size - sum(counts)]:
+            counts[i] += 1
+        return counts, [x - n for x, n in zip(exact, counts)]
+
+    def _blocks(self):
+        carry = None
+        while True:
+            counts, carry = self.block_counts(carry)
+            yield from self._block(counts)
+
+    def _block(self, counts):
+        # One block in random order, drawn without replacement while
+        #   respecting max_run (reshuffled if it paints itself into a corner)
+        for _ in range(BLOCK_RETRIES):
+            left = list(counts)
+            last, run = self._last, self._run
+            order = []
+            while len(order) < self.block_size:
+                weights = [0 if self._blocked(i, last, run) else n for i, n in enumerate(left)]
+                if not any(weights):
+                    break
+                index = self._rng.choices(range(len(left)), weights)[0]
+                left[index] -= 1
+                run = run + 1 if index == last else 1
+                last = index
+                order.append(index)
+            if len(order) == self.block_size:
+                return order
+        # Constraints can't be met (e.g. one clip's share > max_run allows)
+        order = [i for i, n in enumerate(counts) for _ in range(n)]
+        self._rng.shuffle(order)
+        return order
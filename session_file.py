@@ -0,0 +1,207 @@
+# Binary session files (.t7s)
+#
+# Layout: 8-byte magic, a little-endian u32 header length, then a JSON header
+#   (format version, the run's config: cutoff, clips, FPS, input lag, ...)
+#   padded to a 16-byte boundary, then one fixed 24-byte record per trial:
+#   rt f8 (NaN = none), frame i4 (-1 = none), event code u1, a pad byte,
+#   the scenario clip index i2 (-1 = none), the trial's cutoff frame f4 (NaN
+#   = none) and 4 pad bytes. Older formats: 1 = 16 bytes, no clip (3 pad
+#   bytes there), 2 = 16 bytes, no cutoff.
+#   The record count follows from the file size, so the file can be
+#   appended to as trials happen and a record cut off by a crash is simply
+#   ignored. Readers memory-map the records as a NumPy structured array
+#   (no parsing, no copy).
+#
+# Usage: python session_file.py FILE ...  (.csv -> .t7s, .t7s -> .csv)
+
+import datetime
+import json
+import os
+import struct
+import sys
+from array import array
+
+from trial_log import TrialLog
+from trial_store import TrialStore, EVENTS, NAN
+
+MAGIC = b"T7SESS\x00\x01"
+FORMAT_VERSION = 3
+# Record layout per format version (readers take any of them)
+RECORDS = {
+    1: struct.Struct("<diB3x"),   # rt, frame, event code
+    2: struct.Struct("<diBxh"),   # + clip index
+    3: struct.Struct("<diBxhf4x"), # + cutoff frame
+}
+FIELDS = {
+    1: [('rt', '<f8', 0), ('frame', '<i4', 8), ('event', 'u1', 12)],
+    2: [('rt', '<f8', 0), ('frame', '<i4', 8), ('event', 'u1', 12), ('clip', '<i2', 14)],
+    3: [('rt', '<f8', 0), ('frame', '<i4', 8), ('event', 'u1', 12), ('clip', '<i2', 14),
+        ('cutoff', '<f4', 16)],
+}
+RECORD = RECORDS[FORMAT_VERSION]
+RECORD_SIZE = RECORD.size         # 24
+HEADER_ALIGN = 16
+SUFFIX = ".t7s"
+
+
+def record_dtype(version: int = FORMAT_VERSION):
+    import numpy as np
+    names, formats, offsets = zip(*FIELDS[version])
+    return np.dtype({'names': list(names), 'formats': list(formats),
+                     'offsets': list(offsets), 'itemsize': RECORDS[version].size})
+
+def header_bytes(config: dict = None) -> bytes:
+    header = json.dumps({
+        'format': FORMAT_VERSION,
+        'events': list(EVENTS),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'config': config or {},
+    }).encode("utf-8")
+    # Records start on a 16-byte boundary
+    size = len(MAGIC) + 4 + len(header)
+    header += b" " * (-size % HEADER_ALIGN)
+    return MAGIC + struct.pack("<I", len(header)) + header
+
+def pack_record(store: TrialStore, i: int) -> bytes:
+    return RECORD.pack(store.rts[i], store.frames[i], store.events[i], store.clips[i],
+                       store.cutoffs[i])
+
+
+def read_header(f):
+    # Returns: (header dict, offset of the first record)
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("not a session file")
+    (length,) = struct.unpack("<I", f.read(4))
+    raw = f.read(length)
+    if len(raw) != length:
+        raise ValueError("session header is cut off")
+    header = json.loads(raw)
+    if header.get('format') not in RECORDS:
+        raise ValueError(f"unsupported session format {header.get('format')}")
+    return header, len(MAGIC) + 4 + length
+
+def read_session(path: str):
+    # Returns: (header dict, records) with records a read-only structured
+    #   array memory-mapped from the file (fields rt, frame, event[, clip,
+    #   cutoff], by format)
+    import numpy as np
+    with open(path, "rb") as f:
+        header, offset = read_header(f)
+    dtype = record_dtype(header['format'])
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count <= 0:
+        return header, np.zeros(0, dtype=dtype)
+    records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    return header, records
+
+def read_session_store(path: str) -> TrialStore:
+    # Whole session as a TrialStore (without NumPy: records are unpacked
+    #   straight from the file)
+    store = TrialStore()
+    with open(path, "rb") as f:
+        try:
+            header, offset = read_header(f)
+        except ValueError:
+            return store # cut off before the header made it to disk
+        data = f.read()
+    record = RECORDS[header['format']]
+    usable = len(data) - len(data) % record.size
+    for rt, frame, event, *rest in record.iter_unpack(data[:usable]):
+        store.events.append(event)
+        store.rts.append(rt)
+        store.frames.append(frame)
+        store.clips.append(rest[0] if rest else -1)
+        store.cutoffs.append(rest[1] if len(rest) > 1 else NAN)
+    return store
+
+def store_from_records(records) -> TrialStore:
+    # Copy memory-mapped records into a TrialStore
+    import numpy as np
+    store = TrialStore()
+    store.events = array('B', np.ascontiguousarray(records['event']).tobytes())
+    store.rts = array('d', np.ascontiguousarray(records['rt']).tobytes())
+    store.frames = array('i', np.ascontiguousarray(records['frame'], dtype=np.int32).tobytes())
+    if 'clip' in records.dtype.names:
+        store.clips = array('h', np.ascontiguousarray(records['clip'], dtype=np.int16).tobytes())
+    else:
+        store.clips = array('h', [-1]) * len(records)
+    if 'cutoff' in records.dtype.names:
+        store.cutoffs = array('f', np.ascontiguousarray(records['cutoff'], dtype=np.float32).tobytes())
+    else:
+        store.cutoffs = array('f', [NAN]) * len(records)
+    return store
+
+def write_session(path: str, store: TrialStore, config: dict = None):
+    with open(path, "wb") as f:
+        f.write(header_bytes(config))
+        f.write(b"".join(pack_record(store, i) for i in range(len(store))))
+
+
+def csv_to_session(csv_path: str, path: str = None, config: dict = None) -> str:
+    path = path or os.path.splitext(csv_path)[0] + SUFFIX
+    with open(csv_path, "r", encoding="utf-8") as f:
+        store = TrialStore.read_csv(f)
+    write_session(path, store, dict(config or {}, converted_from=os.path.basename(csv_path)))
+    return path
+
+def session_to_csv(path: str, csv_path: str = None) -> str:
+    csv_path = csv_path or os.path.splitext(path)[0] + ".csv"
+    store = read_session_store(path)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        store.write_csv(f)
+    return csv_path
+
+
+class SessionLog(TrialLog):
+    # TrialLog writing .t7s records instead of CSV lines
+    SUFFIX = SUFFIX
+
+    def _open(self, mode: str):
+        return open(self.part_path, mode + "b")
+
+    def _write_header(self):
+        self._file.write(header_bytes(self.config))
+        self._file.flush()
+
+    def _truncate_partial_line(self):
+        # Drop a record cut off by the crash (or a header, and start over).
+        #   A log in an older format is rewritten in the current one.
+        with open(self.part_path, "rb") as f:
+            try:
+                header, offset = read_header(f)
+            except (ValueError, struct.error):
+                offset = None
+        if offset is None:
+            self._file.truncate(0)
+            self._write_header()
+            return
+        if header['format'] != FORMAT_VERSION:
+            store = read_session_store(self.part_path)
+            self._file.truncate(0)
+            self._file.write(header_bytes(header.get('config')))
+            self._file.writelines(pack_record(store, i) for i in range(len(store)))
+            self._file.flush()
+            return
+        size = os.path.getsize(self.part_path)
+        end = size - (size - offset) % RECORD_SIZE
+        if end != size:
+            self._file.truncate(end)
+
+    def append_trial(self, store: TrialStore, i: int):
+        self.append(pack_record(store, i))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python session_file.py FILE ...  (.csv -> .t7s, .t7s -> .csv)")
+        return
+    for path in sys.argv[1:]:
+        if path.endswith(SUFFIX):
+            print(f"{path} -> {session_to_csv(path)}")
+        else:
+            print(f"{path} -> {csv_to_session(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# Two-sided binomial significance test for the block rate
+#
+# p = sum of every pmf(k) <= pmf(hits), computed from tail sums: the binomial
+#   pmf is unimodal, so the k's that qualify are a prefix [0, a] left of the
+#   mode plus a suffix [b, n] right of it. a and b are found by bisection on
+#   cheap lgamma log-pmfs, so each query costs O(log n) comparisons plus two
+#   tail sums instead of ~2*(n+1) pmf calls. The mode itself is checked on its
+#   own, since it can tie with its neighbour.
+#
+# Two backends:
+#   "builtin" (default): pure Python, nothing to import at startup. The pmf is
+#       Loader's saddle-point form (accurate to ~1e-15 relative) and the tails
+#       are summed with the pmf recurrence.
+#   "scipy": scipy.stats.binom, imported on first use.
+# Either way near-ties are settled with scipy's own pmf (imported the first
+#   time one comes up), so exact ties (e.g. k and n-k at 50%) resolve the
+#   same way the original pmf loop did: by its rounding, which is what the
+#   app always reported. Without SciPy the builtin backend counts exact ties
+#   as "<=", as scipy.stats.binomtest does, which can give a larger p than
+#   the original loop (up to 0.5 for tiny n, e.g. 1 hit of 1 at 50%).
+
+from math import exp, lgamma, log, log1p, pi
+
+BACKEND = "builtin"
+
+# log-pmf differences closer than this count as (near-)ties
+TIE_TOLERANCE = 1e-7
+# A tail sum stops once its terms fall below this fraction of the sum
+TAIL_EPSILON = 1e-17
+
+_binom = None
+_scipy_found = None
+
+
+def _have_scipy() -> bool:
+    global _scipy_found
+    if _scipy_found is None:
+        from importlib.util import find_spec
+        _scipy_found = find_spec("scipy") is not None
+    return _scipy_found
+
+def _scipy_binom():
+    global _binom
+    if _binom is None:
+        from scipy.stats import binom
+        _binom = binom
+    return _binom
+
+
+# --- Built-in backend ---
+_LOG_2PI = log(2 * pi)
+# log(n!) - log(sqrt(2*pi*n) * (n/e)^n) for small n
+_STIRLERR = [0.0] + [lgamma(n + 1) - (n + 0.5) * log(n) + n - 0.5 * _LOG_2PI
+                     for n in range(1, 16)]
+
+def _stirlerr(n: int) -> float:
+    if n <= 15:
+        return _STIRLERR[n]
+    nn = n * n
+    s0, s1, s2, s3, s4 = 1 / 12, 1 / 360, 1 / 1260, 1 / 1680, 1 / 1188
+    if n > 500:
+        return (s0 - s1 / nn) / n
+    if n > 80:
+        return (s0 - (s1 - s2 / nn) / nn) / n
+    if n > 35:
+        return (s0 - (s1 - (s2 - s3 / nn) / nn) / nn) / n
+    return (s0 - (s1 - (s2 - (s3 - s4 / nn) / nn) / nn) / nn) / n
+
+def _bd0(x: float, mean: float) -> float:
+    # x*log(x/mean) + mean - x, without the cancellation when x ~ mean
+    if abs(x - mean) < 0.1 * (x + mean):
+        v = (x - mean) / (x + mean)
+        s = (x - mean) * v
+        ej = 2 * x * v
+        v *= v
+        j = 3
+        while True:
+            ej *= v
+            s1 = s + ej / j
+            if s1 == s:
+                return s1
+            s = s1
+            j += 2
+    return x * log(x / mean) + mean - x
+
+def binom_pmf(k: int, n: int, p: float) -> float:
+    if k < 0 or k > n:
+        return 0.0
+    if n == 0:
+        return 1.0
+    q = 1 - p
+    if p <= 0:
+        return 1.0 if k == 0 else 0.0
+    if q <= 0:
+        return 1.0 if k == n else 0.0
+    if k == 0:
+        return exp(-_bd0(n, n * q) - n * p if p < 0.1 else n * log(q))
+    if k == n:
+        return exp(-_bd0(n, n * p) - n * q if q < 0.1 else n * log(p))
+    lc = (_stirlerr(n) - _stirlerr(k) - _stirlerr(n - k)
+          - _bd0(k, n * p) - _bd0(n - k, n * q))
+    return exp(lc - 0.5 * (_LOG_2PI + log(k) + log1p(-k / n)))
+
+def _lower_tail(a: int, n: int, p: float) -> float:
+    # P(X <= a) for a below the mode: pmf(a) + pmf(a-1) + ... (shrinking terms)
+    if a < 0:
+        return 0.0
+    term = total = binom_pmf(a, n, p)
+    if p <= 0 or p >= 1:
+        return total
+    odds_ratio = (1 - p) / p
+    for j in range(a, 0, -1):
+        term *= j / (n - j + 1) * odds_ratio
+        total += term
+        if term <= total * TAIL_EPSILON: # (or both underflowed to 0)
+            break
+    return total
+
+def _upper_tail(b: int, n: int, p: float) -> float:
+    # P(X >= b) = P(Y <= n-b), Y ~ B(n, 1-p)
+    return _lower_tail(n - b, n, 1 - p)
+
+
+class _PmfCompare:
+    # pmf(k) <= pmf(hits), using lgamma and only looking closer on near-ties
+    def __init__(self, chances: int, hits: int, odds: float, backend: str):
+        self.chances = chances
+        self.hits = hits
+        self.odds = odds
+        self.scipy = backend == "scipy"
+        self.settle_ties = self.scipy or _have_scipy()
+        self._observed_pmf = None
+        self.fast = 0.0 < odds < 1.0
+        if self.fast:
+            self.log_p = log(odds)
+            self.log_q = log(1 - odds)
+            self.log_n_fact = lgamma(chances + 1)
+            self.observed_log = self._log_pmf(hits)
+
+    def _log_pmf(self, k: int) -> float:
+        return (self.log_n_fact - lgamma(k + 1) - lgamma(self.chances - k + 1)
+                + k * self.log_p + (self.chances - k) * self.log_q)
+
+    def pmf(self, k: int) -> float:
+        if not self.scipy:
+            return binom_pmf(k, self.chances, self.odds)
+        if self.fast:
+            return exp(self._log_pmf(k))
+        return float(_scipy_binom().pmf(k, self.chances, self.odds))
+
+    def at_most(self, k: int) -> bool:
+        if k == self.hits:
+            return True
+        if self.fast:
+            diff = self._log_pmf(k) - self.observed_log
+            if diff < -TIE_TOLERANCE:
+                return True
+            if diff > TIE_TOLERANCE:
+                return False
+            if not self.settle_ties:
+                return True # tie
+        if not self.settle_ties:
+            return self.pmf(k) <= self.pmf(self.hits)
+        binom = _scipy_binom()
+        if self._observed_pmf is None:
+            self._observed_pmf, pmf_k = binom.pmf([self.hits, k], self.chances, self.odds)
+        else:
+            pmf_k = binom.pmf(k, self.chances, self.odds)
+        return pmf_k <= self._observed_pmf
+
+
+def _mode(chances: int, odds: float) -> int:
+    return min(chances, int((chances + 1) * odds))
+
+def _last_at_most(lo: int, hi: int, compare: _PmfCompare) -> int:
+    # Largest k in [lo, hi] with pmf(k) <= observed on the rising side (or lo-1)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if compare.at_most(mid):
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return hi
+
+def _first_at_most(lo: int, hi: int, compare: _PmfCompare) -> int:
+    # Smallest k in [lo, hi] with pmf(k) <= observed on the falling side (or hi+1)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if compare.at_most(mid):
+            hi = mid - 1
+        else:
+            lo = mid + 1
+    return lo
+
+def binom_two_sided_p(chances: int, hits: int, odds: float, backend: str = None) -> float:
+    backend = backend or BACKEND
+    compare = _PmfCompare(chances, hits, odds, backend)
+    mode = _mode(chances, odds)
+    a = _last_at_most(0, mode - 1, compare)
+    b = _first_at_most(mode + 1, chances, compare)
+    if backend == "scipy":
+        # Lower tail P(X <= a) and upper tail P(X >= b) = P(Y <= n-b),
+        #   Y ~ B(n, 1-p), in a single scipy call
+        left, right = _scipy_binom().cdf([a, chances - b], chances, [odds, 1 - odds])
+        p_value = float(left) + float(right)
+    else:
+        p_value = _lower_tail(a, chances, odds) + _upper_tail(b, chances, odds)
+    if compare.at_most(mode):
+        p_value += compare.pmf(mode)
+    return min(1.0, p_value)
+
+
+class SignificanceTracker:
+    """Running tally of chances/hits; the p-value is only recomputed when
+    the tally has changed since the last query."""
+
+    def __init__(self, odds: float = 0.50):
+        self.odds = odds
+        self.chances = 0
+        self.hits = 0
+        self._cached_for = None
+        self._cached = (0.0, 1.0)
+
+    def add(self, hit: bool):
+        self.chances += 1
+        if hit:
+            self.hits += 1
+
+    def extend(self, chances: int, hits: int):
+        self.chances += chances
+        self.hits += hits
+
+    def reset(self):
+        self.chances = 0
+        self.hits = 0
+
+    def set_odds(self, odds: float):
+        # New null (e.g. a different clip mix); the tally stays
+        self.odds = odds
+        self._cached_for = None
+
+    def result(self):
+        # Returns: tuple[confidence: float, p_value: float]
+        key = (self.chances, self.hits)
+        if key != self._cached_for:
+            p_value = binom_two_sided_p(self.chances, self.hits, self.odds)
+            self._cached = (1 - p_value, p_value)
+            self._cached_for = key
+        return self._cached
+
+    def confidence(self) -> float:
+        return self.result()[0]
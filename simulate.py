@@ -0,0 +1,148 @@
+# Headless driver for the trial state machine
+#
+# Replays a synthetic player through TrialCore/TrialRecorder on a simulated
+#   clock (no window, no video, no sleeping), so thousands of trials run per
+#   second. The player's reaction times are ex-Gaussian (normal + exponential
+#   tail, the usual shape of human RTs).
+#
+# Usage: python simulate.py [--trials N] [--mu MS] [--sigma MS] [--tau MS]
+#                           [--duck P] [--seed S] [--scenario FILE] [--adaptive]
+#                           [--block N] [--max-run N] [--rt-model]
+
+import argparse
+import random
+import time
+from dataclasses import dataclass
+
+from scenario import load_scenario, two_clip_scenario
+from schedule import Schedule
+from trial_core import TrialCore, TrialRecorder
+
+# Defaults match new_minimal.py (which can't be imported without Qt)
+FPS = 60
+MID_TOTAL_FRAMES = 109
+LOW_TOTAL_FRAMES = 109
+LOW_REQUIRED_FRAME = 60 + 18
+REACTION_START_TIME = 1.0
+INPUT_LAG_S = 3 / 60
+BREAK_WINDOW_MS = 500
+ROLLING_WINDOWS = [1, 5, 10, 25, 100, 999]
+
+
+@dataclass
+class PlayerModel:
+    mu: float = 230.0       # ms, ex-Gaussian normal part
+    sigma: float = 25.0
+    tau: float = 50.0       # ms, mean of the exponential tail
+    duck_rate: float = 0.10 # chance of (wrongly) ducking a mid
+
+    def reaction_ms(self, rng):
+        return rng.gauss(self.mu, self.sigma) + rng.expovariate(1 / self.tau)
+
+
+def make_core(scenario=None):
+    return TrialCore(scenario or two_clip_scenario(
+        ("mid", "low"), FPS, MID_TOTAL_FRAMES, LOW_TOTAL_FRAMES,
+        LOW_REQUIRED_FRAME, REACTION_START_TIME
+    ))
+
+def run(trials, model, recorder=None, seed=0, core=None, on_trial=None, quest=None,
+        schedule=None):
+    # Drives `trials` trials; returns the core. `recorder` (optional) gets
+    #   every outcome, `on_trial(core)` (optional) runs in each break,
+    #   `quest` (optional QuestThreshold) picks the cutoff of every duck clip
+    #   and `schedule` (default: unconstrained, from `seed`) the clip order.
+    rng = random.Random(seed)
+    core = core or make_core()
+    schedule = schedule or Schedule(core.scenario.weights, seed)
+    now = 0.0
+    core.space()
+    for _ in range(trials):
+        index = next(schedule)
+        duck = core.clip(index).response == 'duck'
+        core.start_trial(index, now, quest.next_frame() if quest and duck else None)
+        total = core.total_frames()
+        press_at = None
+        if duck or rng.random() < model.duck_rate:
+            press_at = core.reaction_window_start + INPUT_LAG_S + model.reaction_ms(rng) / 1000
+        outcome = None
+        if press_at is not None:
+            frame = int((press_at - now) * FPS)
+            if frame < total:
+                outcome = core.press(press_at, frame, INPUT_LAG_S)
+        end_outcome = core.advance(total)
+        outcome = outcome or end_outcome
+        if quest is not None and duck:
+            quest.update(core.required_frame, outcome[0] == 'low_block')
+        if recorder is not None and outcome:
+            recorder.record(outcome[0], outcome[1], core.s_pressed_frame, core.active_index,
+                            core.required_frame)
+        core.end_of_media()
+        if on_trial is not None:
+            on_trial(core)
+        now += total / FPS + BREAK_WINDOW_MS / 1000
+    return core
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless reaction test simulation")
+    parser.add_argument("--trials", type=int, default=10_000)
+    parser.add_argument("--mu", type=float, default=PlayerModel.mu)
+    parser.add_argument("--sigma", type=float, default=PlayerModel.sigma)
+    parser.add_argument("--tau", type=float, default=PlayerModel.tau)
+    parser.add_argument("--duck", type=float, default=PlayerModel.duck_rate)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", help="scenario JSON (default: the mid/low pair)")
+    parser.add_argument("--adaptive", action="store_true", help="adaptive low cutoff (adaptive.py)")
+    parser.add_argument("--block", type=int, default=None, help="balanced blocks of N trials")
+    parser.add_argument("--max-run", type=int, default=None, help="longest run of one clip")
+    parser.add_argument("--rt-model", action="store_true",
+                        help="fit the low RT distribution and check its block odds")
+    args = parser.parse_args()
+
+    model = PlayerModel(args.mu, args.sigma, args.tau, args.duck)
+    start = time.perf_counter()
+    core = make_core(load_scenario(args.scenario) if args.scenario else None)
+    recorder = TrialRecorder(ROLLING_WINDOWS, odds=core.scenario.chance_rate())
+    quest = None
+    if args.adaptive:
+        from adaptive import QuestThreshold
+        quest = QuestThreshold(REACTION_START_TIME * FPS, LOW_TOTAL_FRAMES)
+    schedule = Schedule(core.scenario.weights, args.seed, args.block, args.max_run)
+    run(args.trials, model, recorder, args.seed, core, quest=quest, schedule=schedule)
+    elapsed = time.perf_counter() - start
+
+    stats = recorder.stats
+    lows = sum(stats.event(e).count for e in ('low_block', 'low_block_late', 'low_miss'))
+    confidence, p_value = recorder.significance.result()
+    print(f"{args.trials} trials in {elapsed:.2f} s ({args.trials/elapsed:,.0f} trials/s)")
+    print(f"blocked {recorder.significance.hits}/{args.trials} "
+          f"({recorder.significance.hits/args.trials*100:.1f}%), "
+          f"lows blocked {stats.event('low_block').count}/{lows}")
+    print(f"significance {confidence*100:.6f}% (p={p_value:.3g}) "
+          f"vs chance {recorder.significance.odds*100:.1f}%")
+    if quest is not None:
+        rng = random.Random(args.seed)
+        rts = sorted(model.reaction_ms(rng) for _ in range(100_000))
+        true_frame = REACTION_START_TIME * FPS + rts[int(len(rts) * 0.75)] * FPS / 1000
+        mean, lo, hi = quest.estimate()
+        print(f"75% cutoff frame {mean:.2f} (95% CI {lo:.2f}-{hi:.2f}) "
+              f"after {quest.trials} lows; model's true value {true_frame:.2f}")
+    if args.rt_model:
+        from rt_distribution import LOW_PRESSES, block_probability, fit_exgauss
+        dist = recorder.rt_distribution
+        fit = fit_exgauss(dist.centers(), dist.counts(LOW_PRESSES))
+        rng = random.Random(args.seed)
+        rts = [model.reaction_ms(rng) for _ in range(100_000)]
+        reaction_frame = REACTION_START_TIME * FPS
+        for frame in (LOW_REQUIRED_FRAME - 4, LOW_REQUIRED_FRAME, LOW_REQUIRED_FRAME + 4):
+            limit = (frame - reaction_frame) / FPS * 1000
+            true_p = sum(rt <= limit for rt in rts) / len(rts)
+            predicted = block_probability(fit, dist.press_rate(), frame, reaction_frame, FPS,
+                                          dist.anticipation_rate())
+            print(f"cutoff frame {frame}: predicted P(block) {predicted*100:.1f}%, "
+                  f"model's true value {true_p*100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# Long-run clip mix of blocked schedules (python -m pytest test_schedule.py)
+
+from collections import Counter
+
+import pytest
+
+from schedule import Schedule
+
+
+@pytest.mark.parametrize("weights, block_size", [
+    ([1, 1], 5),       # 2.5 of each per block
+    ([2, 1, 1], 10),   # 5 / 2.5 / 2.5
+    ([1, 1, 1], 2),    # fewer slots than clips
+    ([0.3, 0.7], 7),
+    ([1, 0, 2], 4),    # a zero weight never plays
+])
+def test_long_run_mix_matches_weights(weights, block_size):
+    blocks = 600
+    schedule = Schedule(weights, seed=1, block_size=block_size)
+    counts = Counter(schedule.take(blocks * block_size))
+    total = sum(weights)
+    for i, weight in enumerate(weights):
+        # Carried remainders keep every clip within one trial of its share
+        assert abs(counts[i] - weight / total * blocks * block_size) <= 1
+
+def test_blocks_stay_balanced():
+    # Each block still holds every clip's share, rounded down or up
+    schedule = Schedule([1, 1], seed=2, block_size=5, max_run=2)
+    for _ in range(100):
+        assert sorted(Counter(schedule.take(5)).values()) == [2, 3]
@@ -0,0 +1,126 @@
+# The trial state machine, without Qt
+#
+# TrialCore holds the per-trial state that used to live in keyPressEvent /
+#   on_frame_advance / on_media_status_changed and decides the outcome of a
+#   trial; the window only feeds it timestamps and frame numbers and turns
+#   outcomes into overlays and sounds. What each clip expects comes from a
+#   Scenario (see scenario.py). TrialRecorder is everything that
+#   happens to an outcome afterwards (history, log, stats, significance,
+#   RT histograms).
+#   Both can be driven headlessly (see simulate.py).
+
+from rolling_stats import StatsAggregator
+from rt_distribution import RtDistribution
+from significance import SignificanceTracker
+from trial_store import TrialStore, EVENT_INFO
+
+class TrialCore:
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.fps = scenario.fps
+        # Cutoff frame for the active duck clip and the latest adjusted RT (ms)
+        #   that still makes it
+        self.required_frame = None
+        self.target_adj_RT = None
+
+        # Flow
+        self.waiting_for_space = True   # Start paused
+        self.pause_after_video = False
+
+        # Trial state
+        self.active_index = None
+        self.video_ended = False
+        self.s_pressed = False
+        self.s_pressed_frame = None
+        self.trial_start_time = None
+        self.reaction_window_start = None
+
+    def clip(self, index=None):
+        return self.scenario[self.active_index if index is None else index]
+
+    def total_frames(self, index=None):
+        return self.clip(index).total_frames
+
+    def space(self):
+        # Returns: 'start' (begin a trial), 'pause' (pause after this clip) or None
+        if self.waiting_for_space:
+            self.waiting_for_space = False
+            return 'start'
+        if not self.video_ended:
+            self.pause_after_video = True
+            return 'pause'
+        return None
+
+    def start_trial(self, index, now, required_frame=None):
+        # required_frame: cutoff for a duck clip (None = the clip's own)
+        self.active_index = index
+        self.video_ended = False
+        self.s_pressed = False
+        self.s_pressed_frame = None
+        self.trial_start_time = now
+        clip = self.clip(index)
+        self.reaction_window_start = now + clip.reaction_frame / self.fps
+        if clip.response == 'duck':
+            self.required_frame = clip.required_frame if required_frame is None else required_frame
+            self.target_adj_RT = (self.required_frame - clip.reaction_frame) / self.fps * 1000
+        else:
+            self.required_frame = None
+            self.target_adj_RT = None
+
+    def press(self, now, frame, input_lag_s):
+        # S pressed at `now`, while `frame` was displayed.
+        #   Returns: (event, adjusted RT in ms or None) or None if it doesn't count
+        if self.video_ended or self.s_pressed or self.active_index is None:
+            return None
+        self.s_pressed = True
+        self.s_pressed_frame = frame
+        adj_rt = (now - self.reaction_window_start - input_lag_s) * 1000
+        rt = adj_rt if adj_rt > 0 else None
+        if self.clip().response == 'stand':
+            return ('mid_duck', rt)
+        if adj_rt <= self.target_adj_RT:
+            return ('low_block', rt)
+        return ('low_block_late', rt)
+
+    def advance(self, frame):
+        # The clip reached `frame`. Returns the outcome if the clip just ended
+        #   without a press, else None
+        if self.video_ended or self.active_index is None:
+            return None
+        if frame < self.total_frames():
+            return None
+        self.video_ended = True
+        if self.s_pressed:
+            return None
+        return ('mid_block', None) if self.clip().response == 'stand' else ('low_miss', None)
+
+    def end_of_media(self):
+        # Returns: True to go on to the next trial, False to wait for space
+        self.video_ended = True
+        if self.pause_after_video:
+            self.pause_after_video = False
+            self.waiting_for_space = True
+            return False
+        return True
+
+
+class TrialRecorder:
+    def __init__(self, windows, history=None, log=None, odds=0.50):
+        # odds: chance block rate (the significance null; see
+        #   Scenario.chance_rate)
+        self.history = history if history is not None else TrialStore()
+        self.log = log
+        self.stats = StatsAggregator.from_store(self.history, windows)
+        self.significance = SignificanceTracker(odds) # blocks vs. guessing
+        self.significance.extend(len(self.history), self.history.correct_count())
+        self.rt_distribution = RtDistribution.from_store(self.history)
+
+    def record(self, event, rt=None, frame=None, clip=None, cutoff=None):
+        # clip: scenario index of the clip the trial played; cutoff: its
+        #   required frame (duck clips)
+        self.history.append(event, rt, frame, clip, cutoff)
+        if self.log is not None:
+            self.log.append_trial(self.history, -1)
+        self.stats.add_event(event, rt)
+        self.significance.add(EVENT_INFO[event][0])
+        self.rt_distribution.add(event, rt)
@@ -0,0 +1,172 @@
+# Append-only, crash-safe session log
+#
+# Each trial's CSV line is buffered in memory as it happens (no I/O in the
+#   reaction window); flush() hands the buffer to a background writer thread,
+#   which appends and fsyncs it. The app calls flush() in the break between
+#   trials. While a session is running the log is named "*.csv.part"; on a
+#   clean exit it is renamed to the usual "guesses_<timestamp>.csv". A .part
+#   file found on the next launch means the last session died, and its
+#   trials can be recovered from it. The session's config (clips, schedule
+#   seed, ...) goes in a "<log>.json" sidecar. session_file.SessionLog is the
+#   same log in the binary session format (.t7s), with the config in its
+#   header instead. Settings changed mid-session (see config_profiles.py) are
+#   listed under "changes" in the sidecar (for either format).
+
+import datetime
+import glob
+import json
+import os
+import queue
+import threading
+
+from trial_store import TrialStore, CSV_FIELDS
+
+PART_SUFFIX = ".part"
+CONFIG_SUFFIX = ".json"
+LOG_SUFFIXES = (".csv", ".t7s") # text / binary (session_file.py) logs
+
+
+def session_filename(directory: str, when=None, suffix: str = ".csv") -> str:
+    # Format: "2025-05-03 12:02 AM"
+    when = when or datetime.datetime.now()
+    timestamp = when.strftime("%Y-%m-%d %I;%M %p")
+    return os.path.join(directory, f"guesses_{timestamp}{suffix}")
+
+def find_partial_logs(directory: str):
+    # Oldest first
+    paths = []
+    for suffix in LOG_SUFFIXES:
+        paths += glob.glob(os.path.join(directory, "*" + suffix + PART_SUFFIX))
+    return sorted(paths, key=os.path.getmtime)
+
+def recover_partial_log(part_path: str) -> TrialStore:
+    if part_path.endswith(".t7s" + PART_SUFFIX):
+        from session_file import read_session_store
+        return read_session_store(part_path)
+    with open(part_path, "r", encoding="utf-8") as f:
+        return TrialStore.read_csv(f)
+
+def finalize_partial_log(part_path: str) -> str:
+    # Turn a leftover .part into a normal log (without clobbering one)
+    final = part_path[:-len(PART_SUFFIX)]
+    base, ext = os.path.splitext(final)
+    n = 1
+    while os.path.exists(final):
+        final = f"{base} ({n}){ext}"
+        n += 1
+    os.replace(part_path, final)
+    if os.path.exists(part_path + CONFIG_SUFFIX):
+        os.replace(part_path + CONFIG_SUFFIX, final + CONFIG_SUFFIX)
+    return final
+
+
+class TrialLog:
+    SUFFIX = ".csv"
+
+    def __init__(self, directory: str = "log", resume_path: str = None, config: dict = None):
+        # config: the session's settings, saved with a new log
+        os.makedirs(directory, exist_ok=True)
+        self.config = config
+        self.changes = []
+        if resume_path is not None:
+            # Keep appending to a recovered session's log
+            self.part_path = resume_path
+            self._file = self._open("a")
+            self._truncate_partial_line()
+            self._read_config()
+        else:
+            self.part_path = session_filename(directory, suffix=self.SUFFIX) + PART_SUFFIX
+            self._file = self._open("w")
+            self._write_header()
+        self._pending = []
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _open(self, mode: str):
+        return open(self.part_path, mode, encoding="utf-8")
+
+    def _write_header(self):
+        self._file.write(",".join(CSV_FIELDS) + "\n")
+        self._file.flush()
+        if self.config is not None:
+            self._write_config()
+
+    def _read_config(self):
+        # A recovered session's sidecar (config and/or earlier changes)
+        try:
+            with open(self.part_path + CONFIG_SUFFIX, "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.changes = sidecar.pop('changes', [])
+        self.config = self.config or sidecar or None
+
+    def _write_config(self):
+        sidecar = dict(self.config or {})
+        if self.changes:
+            sidecar['changes'] = self.changes
+        # Written aside and swapped in, so a crash mid-write can't lose the
+        #   seed the sidecar is there to keep
+        path = self.part_path + CONFIG_SUFFIX
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def _truncate_partial_line(self):
+        # Drop a line cut off by the crash so the next append starts clean.
+        #   A log with older columns is rewritten with the current ones.
+        with open(self.part_path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            self._file.truncate(end)
+        if end == 0:
+            self._write_header()
+        elif data[:data.find(b"\n")].decode("utf-8").strip().split(",") != CSV_FIELDS:
+            with open(self.part_path, "r", encoding="utf-8") as f:
+                store = TrialStore.read_csv(f)
+            self._file.truncate(0)
+            self._file.write(",".join(CSV_FIELDS) + "\n")
+            self._file.writelines(store.csv_lines())
+            self._file.flush()
+
+    def _write_loop(self):
+        while True:
+            lines = self._queue.get()
+            if lines is None:
+                break
+            self._file.writelines(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def append(self, line: str):
+        # Buffer only; nothing touches the disk until flush()
+        self._pending.append(line)
+
+    def append_trial(self, store: TrialStore, i: int):
+        self.append(store.csv_line(i))
+
+    def add_change(self, change: dict):
+        # Record a mid-session settings change (rare: written right away)
+        self.changes.append(change)
+        self._write_config()
+
+    def flush(self):
+        # Cheap on the calling thread: the write happens on the writer thread
+        if self._pending:
+            self._queue.put(self._pending)
+            self._pending = []
+
+    def close(self, keep: bool = True):
+        # Returns the final path of the log, or None if it was discarded
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+        if not keep:
+            os.remove(self.part_path)
+            if os.path.exists(self.part_path + CONFIG_SUFFIX):
+                os.remove(self.part_path + CONFIG_SUFFIX)
+            return None
+        return finalize_partial_log(self.part_path)
@@ -0,0 +1,178 @@
+# Compact, columnar storage for the trial history
+#
+# Instead of a dict per trial, events are stored as one-byte codes and RTs /
+#   pressed frames / scenario clip indices / cutoff frames as typed arrays
+#   (NaN / -1 for "none"), about 19 bytes per trial. The old dict fields
+#   (correct, rt_type, video_type) are all derived from the event + RT, so
+#   they aren't stored at all. Rows can still be read back as dicts for
+#   anything that wants the old shape.
+
+from array import array
+from math import isnan
+
+NAN = float('nan')
+
+# event name -> (correct, video_type); the order defines the stored code
+EVENT_INFO = {
+    'mid_block':      (True,  'mid'),
+    'mid_duck':       (False, 'mid'),
+    'low_block':      (True,  'low'),
+    'low_block_late': (False, 'low'),
+    'low_miss':       (False, 'low'),
+}
+EVENTS = tuple(EVENT_INFO)
+EVENT_CODES = {event: code for code, event in enumerate(EVENTS)}
+
+# Columns of the CSV log, in order
+CSV_FIELDS = ['correct', 'rt', 'rt_type', 'video_type', 'event', 'frame', 'clip', 'cutoff']
+
+
+def rt_type_for(correct: bool, rt):
+    if rt is None:
+        return None
+    return 'correct' if correct else 'incorrect'
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+class TrialStore:
+    __slots__ = ('events', 'rts', 'frames', 'clips', 'cutoffs')
+
+    def __init__(self):
+        self.events = array('B')
+        self.rts = array('d')
+        self.frames = array('i')
+        self.clips = array('h') # scenario clip index
+        self.cutoffs = array('f') # a duck clip's required frame (varies when adaptive)
+
+    def append(self, event: str, rt=None, frame=None, clip=None, cutoff=None):
+        self.events.append(EVENT_CODES[event])
+        self.rts.append(NAN if rt is None else rt)
+        self.frames.append(-1 if frame is None else frame)
+        self.clips.append(-1 if clip is None else clip)
+        self.cutoffs.append(NAN if cutoff is None else cutoff)
+
+    def __len__(self):
+        return len(self.events)
+
+    def row(self, i: int) -> dict:
+        event = EVENTS[self.events[i]]
+        correct, video_type = EVENT_INFO[event]
+        rt = self.rts[i]
+        rt = None if isnan(rt) else rt
+        frame = self.frames[i]
+        clip = self.clips[i]
+        cutoff = self.cutoffs[i]
+        return {
+            'correct': correct,
+            'rt': rt,
+            'rt_type': rt_type_for(correct, rt),
+            'video_type': video_type,
+            'event': event,
+            'frame': None if frame < 0 else frame,
+            'clip': None if clip < 0 else clip,
+            'cutoff': None if isnan(cutoff) else cutoff,
+        }
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            sliced = TrialStore()
+            sliced.events = self.events[i]
+            sliced.rts = self.rts[i]
+            sliced.frames = self.frames[i]
+            sliced.clips = self.clips[i]
+            sliced.cutoffs = self.cutoffs[i]
+            return sliced
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("trial index out of range")
+        return self.row(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    # --- Vectorized reductions (NumPy views over the arrays; don't append
+    #   while holding one) ---
+    def columns(self):
+        # Returns: (event codes, rts with NaN for none, frames with -1 for none)
+        np = _np()
+        return (np.frombuffer(self.events, dtype=np.uint8),
+                np.frombuffer(self.rts, dtype=np.float64),
+                np.frombuffer(self.frames, dtype=np.int32))
+
+    def event_counts(self) -> dict:
+        np = _np()
+        events, _, _ = self.columns()
+        counts = np.bincount(events, minlength=len(EVENTS))
+        return {event: int(counts[code]) for code, event in enumerate(EVENTS)}
+
+    def event_rt_sums(self) -> dict:
+        # event -> (sum of valid RTs, number of valid RTs)
+        np = _np()
+        events, rts, _ = self.columns()
+        valid = ~np.isnan(rts)
+        sums = np.bincount(events[valid], weights=rts[valid], minlength=len(EVENTS))
+        counts = np.bincount(events[valid], minlength=len(EVENTS))
+        return {event: (float(sums[code]), int(counts[code]))
+                for code, event in enumerate(EVENTS)}
+
+    def correct_count(self) -> int:
+        # Plain array.count, so startup doesn't pull in NumPy just for this
+        return sum(self.events.count(EVENT_CODES[event])
+                   for event in EVENTS if EVENT_INFO[event][0])
+
+    # --- CSV ---
+    def csv_line(self, i: int) -> str:
+        # Same formatting as str() of the old dict values
+        row = self.row(i)
+        return ",".join(str(row[field]) for field in CSV_FIELDS) + "\n"
+
+    def csv_lines(self):
+        for i in range(len(self)):
+            yield self.csv_line(i)
+
+    def write_csv(self, f):
+        f.write(",".join(CSV_FIELDS) + "\n")
+        f.writelines(self.csv_lines())
+
+    @classmethod
+    def read_csv(cls, f):
+        # Inverse of write_csv; also reads logs from before the frame / clip /
+        #   cutoff columns.
+        #   Lines that don't parse (e.g. cut off by a crash) are skipped.
+        store = cls()
+        header = f.readline().strip().split(",")
+        try:
+            event_col = header.index('event')
+            rt_col = header.index('rt')
+        except ValueError:
+            return store
+        frame_col = header.index('frame') if 'frame' in header else None
+        clip_col = header.index('clip') if 'clip' in header else None
+        cutoff_col = header.index('cutoff') if 'cutoff' in header else None
+        for line in f:
+            if not line.endswith("\n"):
+                continue # last line of a log cut off mid-write
+            values = line.rstrip("\n").split(",")
+            if len(values) != len(header):
+                continue
+            try:
+                rt = None if values[rt_col] == 'None' else float(values[rt_col])
+                frame = None
+                if frame_col is not None and values[frame_col] != 'None':
+                    frame = int(values[frame_col])
+                clip = None
+                if clip_col is not None and values[clip_col] != 'None':
+                    clip = int(values[clip_col])
+                cutoff = None
+                if cutoff_col is not None and values[cutoff_col] != 'None':
+                    cutoff = float(values[cutoff_col])
+                store.append(values[event_col], rt, frame, clip, cutoff)
+            except (KeyError, ValueError):
+                continue
+        return store